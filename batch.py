@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import sys
+import time
+
+import engine
+import evaluation
+
+# numpy is only needed for batches, the game and the engine run without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# positions are exported as 12 bitboards or 12 piece planes of 8x8: white
+# pawn, knight, bishop, rook, queen and king first, then the same for
+# black. Bit row*8 + col of a bitboard is set for every piece on that
+# square, row 0 is the 8th rank like on the board. A whole batch is scored
+# with a few array operations using the same tables and rounding as
+# evaluation.evaluate, so the scores are identical
+
+PIECE_TYPES = ["Pawn", "Knight", "Bishop", "Rook", "Queen", "King"]
+PLANES = [(player, pieceType) for player in ["white", "black"] for pieceType in PIECE_TYPES]
+PLANE_INDEX = {plane: i for i, plane in enumerate(PLANES)}
+
+# FEN letters in plane order
+FEN_PLANES = {symbol: i for i, symbol in enumerate("PNBRQKpnbrqk")}
+
+
+def requireNumpy():
+
+    if np == None:
+        raise ImportError("Batch evaluation needs numpy, install it with pip install numpy.")
+
+    return
+
+
+def buildByteTables():
+
+    """
+    The score tables of the evaluation per byte of the bitboards: for each
+    of the 8 rows of the 12 planes and each of the 256 ways pieces can
+    stand on that row, the middlegame score, endgame score and phase they
+    add up to. The tables are flat arrays indexed by (plane*8 + row)*256 +
+    byte, so a position is scored with 96 lookups instead of going through
+    its 768 squares.
+    """
+
+    bits = (np.arange(256)[:, None] >> np.arange(8)) & 1
+
+    tables = []
+
+    for weights in (lambda plane: evaluation.MIDGAME_SCORES[plane],
+                    lambda plane: evaluation.ENDGAME_SCORES[plane],
+                    lambda plane: [evaluation.PHASE_WEIGHTS[plane[1]]] * 64):
+
+        squares = np.array([weights(plane) for plane in PLANES], dtype = np.int64).reshape(-1, 8)
+        tables.append((squares @ bits.T).reshape(-1))
+
+    return tables
+
+
+if np != None:
+    MIDGAME_BYTES, ENDGAME_BYTES, PHASE_BYTES = buildByteTables()
+    BYTE_OFFSETS = np.arange(len(PLANES) * 8) * 256
+
+
+def toBitboards(gamestate):
+
+    """
+    Returns the 12 bitboards of a game state as a list of integers. A
+    BitBoard already has them, a Board is read from the active pieces.
+    """
+
+    if isinstance(gamestate.board, engine.BitBoard):
+        return [gamestate.board.pieces[plane] for plane in PLANES]
+
+    bitboards = [0] * len(PLANES)
+
+    for player in gamestate.players:
+
+        for piece in gamestate.activePieces[player]:
+            bitboards[PLANE_INDEX[player, piece.pieceType]] |= 1 << (piece.row*8 + piece.col)
+
+    return bitboards
+
+
+def fenToBitboards(fen):
+
+    """
+    Returns the 12 bitboards of a position in FEN as a list of integers and
+    whether white is to move, without setting up a game state. Only the
+    piece placement and the turn player are read.
+    """
+
+    fields = fen.split()
+
+    if len(fields) < 2 or fields[1] not in ("w", "b"):
+        raise ValueError(f"FEN needs the piece placement and the turn player: {fen}")
+
+    bitboards = [0] * len(PLANES)
+    square = 0
+
+    for symbol in fields[0]:
+
+        if symbol == "/":
+            continue
+
+        if symbol.isdigit():
+
+            square += int(symbol)
+            continue
+
+        if symbol not in FEN_PLANES:
+            raise ValueError(f"Invalid piece {symbol} in FEN: {fen}")
+
+        bitboards[FEN_PLANES[symbol]] |= 1 << square
+        square += 1
+
+    if square != 64:
+        raise ValueError(f"FEN needs 64 squares: {fen}")
+
+    return bitboards, fields[1] == "w"
+
+
+def encodeBitboards(gamestates):
+
+    """
+    Exports game states as a uint64 array of shape (N, 12) with the
+    bitboards and a bool array of shape (N,) that is True where white is
+    to move.
+    """
+
+    requireNumpy()
+
+    bitboards = np.array([toBitboards(gamestate) for gamestate in gamestates],
+                         dtype = np.uint64).reshape(-1, len(PLANES))
+    whiteToMove = np.array([gamestate.turnPlayer == "white" for gamestate in gamestates], dtype = bool)
+
+    return bitboards, whiteToMove
+
+
+def encodeFENs(fens):
+
+    """
+    Same as encodeBitboards for positions in FEN, which is much faster
+    than setting up a game state for each of them.
+    """
+
+    requireNumpy()
+
+    positions = [fenToBitboards(fen) for fen in fens]
+
+    bitboards = np.array([bits for bits, _ in positions], dtype = np.uint64).reshape(-1, len(PLANES))
+    whiteToMove = np.array([white for _, white in positions], dtype = bool)
+
+    return bitboards, whiteToMove
+
+
+def bitboardsToPlanes(bitboards):
+
+    """
+    Unpacks bitboards of shape (N, 12) into piece planes, a uint8 array of
+    shape (N, 12, 8, 8) with a 1 where a piece stands.
+    """
+
+    requireNumpy()
+
+    # the least significant byte of a bitboard is the first row
+    rows = bitboards.astype("<u8").view(np.uint8).reshape(len(bitboards), len(PLANES), 8)
+
+    return np.unpackbits(rows, axis = -1, bitorder = "little").reshape(len(bitboards), len(PLANES), 8, 8)
+
+
+def encodePlanes(gamestates):
+
+    """
+    Exports game states as piece planes of shape (N, 12, 8, 8) and the bool
+    array of the turn players.
+    """
+
+    bitboards, whiteToMove = encodeBitboards(gamestates)
+
+    return bitboardsToPlanes(bitboards), whiteToMove
+
+
+def evaluateBitboards(bitboards, whiteToMove):
+
+    """
+    Scores a batch of positions given as bitboards of shape (N, 12),
+    returns an int64 array with the score of every position in centipawns
+    from the point of view of its turn player, the same as
+    evaluation.evaluate.
+    """
+
+    requireNumpy()
+
+    rows = bitboards.astype("<u8").view(np.uint8).reshape(len(bitboards), len(PLANES) * 8)
+    indices = rows + BYTE_OFFSETS
+
+    midgame = MIDGAME_BYTES[indices].sum(axis = 1)
+    endgame = ENDGAME_BYTES[indices].sum(axis = 1)
+    phase = np.minimum(PHASE_BYTES[indices].sum(axis = 1), evaluation.MAX_PHASE)
+
+    score = (midgame * phase + endgame * (evaluation.MAX_PHASE - phase)) // evaluation.MAX_PHASE
+
+    return np.where(whiteToMove, score, -score)
+
+
+def evaluatePlanes(planes, whiteToMove):
+
+    """
+    Same as evaluateBitboards for positions given as piece planes of shape
+    (N, 12, 8, 8).
+    """
+
+    requireNumpy()
+
+    rows = np.packbits(planes.astype(bool), axis = -1, bitorder = "little")
+
+    return evaluateBitboards(rows.reshape(len(planes), -1).view("<u8"), whiteToMove)
+
+
+def evaluatePositions(gamestates):
+
+    """
+    Scores a list of game states in one call.
+    """
+
+    return evaluateBitboards(*encodeBitboards(gamestates))
+
+
+def main():
+
+    """
+    Command line interface for scoring a file of positions in FEN, one per
+    line.
+    """
+
+    parser = argparse.ArgumentParser(description = "Score a file of positions with the evaluation.")
+    parser.add_argument("file",
+                        help = "file with one position in FEN per line, - for stdin")
+    parser.add_argument("-q", "--quiet", action = "store_true",
+                        help = "don't print the scores, only the summary")
+    parser.add_argument("--check", action = "store_true",
+                        help = "compare every score with the evaluation of a game state")
+    args = parser.parse_args()
+
+    file = sys.stdin if args.file == "-" else open(args.file)
+
+    try:
+        fens = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+    start = time.perf_counter()
+    scores = evaluateBitboards(*encodeFENs(fens))
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+
+        for fen, score in zip(fens, scores):
+            print(f"{score}  {fen}")
+
+    print(f"positions {len(fens)}  time {elapsed:.3f}s  "
+          f"positions/s {len(fens) / elapsed if elapsed > 0 else 0.0:.0f}", file = sys.stderr)
+
+    if args.check:
+
+        mismatches = 0
+
+        for fen, score in zip(fens, scores):
+
+            if evaluation.evaluate(engine.GameState.fromFEN(fen)) != score:
+
+                mismatches += 1
+                print(f"mismatch {score}  {fen}", file = sys.stderr)
+
+        print(f"mismatches {mismatches}", file = sys.stderr)
+
+        return 1 if mismatches else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+
+    raise SystemExit(main())
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import collections
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import time
+
+import pgn
+
+
+# an opening book is a file of fixed-size records sorted by the Zobrist key
+# of the position: the key, the moveID of a move played in it and how often
+# it was played. The file is memory-mapped and searched in place, so opening
+# a book costs nothing and processes reading the same book share its pages.
+# Keys come from the engine's Zobrist tables, a book only works with the
+# tables it was built with
+
+RECORD = struct.Struct(">QHI")
+
+
+class OpeningBook():
+
+    """
+    Read-only view of a book file. Can be used as a context manager.
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+
+        if size % RECORD.size != 0:
+
+            self.file.close()
+            raise ValueError(f"{path} is not a book file, its size isn't a multiple of {RECORD.size}.")
+
+        self.records = size // RECORD.size
+
+        # empty files can't be mapped
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ) if size else b""
+
+
+    def __enter__(self):
+
+        return self
+
+
+    def __exit__(self, *exception):
+
+        self.close()
+
+        return False
+
+
+    def __len__(self):
+
+        return self.records
+
+
+    def close(self):
+
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+        self.file.close()
+
+        return
+
+
+    def keyAt(self, index):
+
+        """
+        Returns the key of the record at an index.
+        """
+
+        return RECORD.unpack_from(self.data, index * RECORD.size)[0]
+
+
+    def entries(self, key):
+
+        """
+        Returns a list of tuples of the moveID and the weight of every book
+        move for a Zobrist key, the most played move first.
+        """
+
+        # the records are sorted by key, so the first one is found by
+        # binary search without reading the rest of the file
+        low = 0
+        high = self.records
+
+        while low < high:
+
+            middle = (low + high) // 2
+
+            if self.keyAt(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        index = low
+
+        entries = []
+
+        while index < self.records:
+
+            recordKey, moveID, weight = RECORD.unpack_from(self.data, index * RECORD.size)
+
+            if recordKey != key:
+                break
+
+            entries.append((moveID, weight))
+            index += 1
+
+        return entries
+
+
+    def bookMoves(self, gamestate):
+
+        """
+        Returns a list of tuples of the legal move and its weight for every
+        book move of a game state. Moves that aren't legal, which can only
+        happen when two positions share a key, are left out.
+        """
+
+        moves = []
+
+        for moveID, weight in self.entries(gamestate.zobristKey):
+
+            move = gamestate.legalMoveFromID(moveID)
+
+            if move != None:
+                moves.append((move, weight))
+
+        return moves
+
+
+    def pickMove(self, gamestate, rng = None):
+
+        """
+        Picks one of the book moves of a game state at random, weighted by
+        how often they were played. Returns None if the position isn't in
+        the book.
+        """
+
+        moves = self.bookMoves(gamestate)
+
+        if not moves:
+            return None
+
+        if rng == None:
+            rng = random
+
+        return rng.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+
+def gameEntries(task):
+
+    """
+    Worker function, replays the first plies of a game and returns the
+    Zobrist key and moveID of every move, or None if the game has an
+    illegal or unparseable move in them.
+    """
+
+    game, maxPlies = task
+
+    moves, _ = pgn.tokenize(game.movetext)
+    entries = []
+
+    try:
+
+        gamestate = pgn.startingPosition(game)
+
+        for san in moves[:maxPlies]:
+
+            move = pgn.parseSAN(gamestate, san)
+            entries.append((gamestate.zobristKey, move.moveID))
+            gamestate.performMove(move)
+
+    except pgn.PGNError:
+
+        return None
+
+    return entries
+
+
+def buildBook(lines, path, maxPlies = 20, minCount = 1, processes = None, batchSize = 1000):
+
+    """
+    Builds a book file from the games of a PGN file given as an iterable of
+    lines. Only the first maxPlies of every game are used and moves played
+    fewer than minCount times are left out. Returns a dictionary with the
+    number of games read and skipped, the number of records written and the
+    elapsed time.
+    """
+
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+
+    counts = collections.Counter()
+    games = 0
+    skipped = 0
+
+    start = time.perf_counter()
+
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+
+    try:
+
+        for batch in pgn.batches(pgn.readGames(lines), batchSize):
+
+            tasks = [(game, maxPlies) for game in batch]
+
+            if pool != None:
+                results = pool.imap(gameEntries, tasks, chunksize = 16)
+            else:
+                results = map(gameEntries, tasks)
+
+            for entries in results:
+
+                games += 1
+
+                if entries == None:
+
+                    skipped += 1
+                    continue
+
+                counts.update(entries)
+
+    finally:
+
+        if pool != None:
+
+            pool.close()
+            pool.join()
+
+    # sorted by key, the most played move of a position first
+    records = sorted(((key, moveID, count) for (key, moveID), count in counts.items()
+                      if count >= minCount),
+                     key = lambda record: (record[0], -record[2], record[1]))
+
+    with open(path, "wb") as file:
+
+        for key, moveID, count in records:
+            file.write(RECORD.pack(key, moveID, min(count, 0xFFFFFFFF)))
+
+    return {"games": games, "skipped": skipped, "records": len(records),
+            "time": time.perf_counter() - start}
+
+
+def main():
+
+    """
+    Command line interface for building opening books.
+    """
+
+    parser = argparse.ArgumentParser(description = "Build an opening book from PGN files.")
+    parser.add_argument("files", nargs = "+",
+                        help = "PGN files to read")
+    parser.add_argument("-o", "--output", default = "book.bin",
+                        help = "book file to write")
+    parser.add_argument("--plies", type = int, default = 20,
+                        help = "number of plies of every game that go into the book")
+    parser.add_argument("--min-count", type = int, default = 1,
+                        help = "moves played fewer times are left out")
+    parser.add_argument("-j", "--processes", type = int, default = None,
+                        help = "number of processes the games are spread over, "
+                               "defaults to the number of CPUs")
+    args = parser.parse_args()
+
+    def readLines():
+
+        for path in args.files:
+
+            with open(path, encoding = "utf-8", errors = "replace") as file:
+                yield from file
+
+    statistics = buildBook(readLines(), args.output, args.plies, args.min_count, args.processes)
+
+    print(f"{args.output}  games {statistics['games']}  skipped {statistics['skipped']}  "
+          f"records {statistics['records']}  time {statistics['time']:.3f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+
+    raise SystemExit(main())
@@ -1,15 +1,136 @@
 # -*- coding: utf-8 -*-
 
+import json
+import random
+import sys
+import time
+
+import evaluation
+
+
+def buildZobristTables(seed = 2023):
+    
+    """
+    Generates the random 64 bit numbers used for Zobrist hashing. One per
+    piece type, player and square, one per castling right, one per en 
+    passant column and one for black being the turn player. The seed is 
+    fixed so keys are the same in every process.
+    """
+    
+    generator = random.Random(seed)
+    
+    pieces = {(player, pieceType): [generator.getrandbits(64) for _ in range(64)]
+              for player in ["white", "black"]
+              for pieceType in ["Pawn", "Rook", "Knight", "Bishop", "Queen", "King"]}
+    castling = {(player, side): generator.getrandbits(64)
+                for player in ["white", "black"]
+                for side in ["0-0", "0-0-0"]}
+    enPassant = [generator.getrandbits(64) for _ in range(8)]
+    blackToMove = generator.getrandbits(64)
+    
+    return pieces, castling, enPassant, blackToMove
+
+
+ZOBRIST_PIECES, ZOBRIST_CASTLING, ZOBRIST_EN_PASSANT, ZOBRIST_BLACK_TO_MOVE = buildZobristTables()
+
+
+# kinds of moves that can be generated, captures include all promotions
+ALL_MOVES = 0
+CAPTURES = 1
+QUIETS = 2
+
+# order of captures in staged move generation, most valuable victim first,
+# least valuable attacker second
+CAPTURE_ORDER = {"Pawn": 1, "Knight": 2, "Bishop": 3, "Rook": 4, "Queen": 5, "King": 6}
+
+
+def buildSquareTables():
+    
+    """
+    Precomputes the squares that move generation and check detection walk
+    over, so they don't have to do bounds checks at runtime. All tables are
+    indexed by the square row*8 + col and contain (row, col) tuples. 
+    Returns the knight, king and pawn (per player) target squares per 
+    square, the rays per square as a dictionary of direction and the 
+    squares in that direction ordered away from the square, and the 
+    squares strictly between two squares on a shared line (empty if they 
+    don't share one).
+    """
+    
+    knightCoordinates = [(2, 1), (-2, 1), (2, -1), (-2, -1), 
+                         (1, 2), (1, -2), (-1, 2), (-1, -2)]
+    unitVectors = [(1, 0), (-1, 0), (0, 1), (0, -1),  
+                   (1, 1), (-1, 1), (1, -1), (-1, -1)]
+    
+    knightTargets = []
+    kingTargets = []
+    pawnTargets = {"white": [], "black": []}
+    rays = []
+    between = [[[] for _ in range(64)] for _ in range(64)]
+    
+    for row in range(8):
+        
+        for col in range(8):
+            
+            knightTargets.append([(row + c[0], col + c[1]) for c in knightCoordinates
+                                  if 0 <= row + c[0] <= 7 and 0 <= col + c[1] <= 7])
+            kingTargets.append([(row + c[0], col + c[1]) for c in unitVectors
+                                if 0 <= row + c[0] <= 7 and 0 <= col + c[1] <= 7])
+            
+            # white pawns attack upwards, black pawns downwards
+            for player, d in [("white", -1), ("black", 1)]:
+                
+                pawnTargets[player].append([(row + d, col + c) for c in (1, -1)
+                                            if 0 <= row + d <= 7 and 0 <= col + c <= 7])
+            
+            squareRays = {}
+            
+            for u in unitVectors:
+                
+                ray = []
+                currRow = row + u[0]
+                currCol = col + u[1]
+                
+                while 0 <= currRow <= 7 and 0 <= currCol <= 7:
+                    
+                    # everything passed so far lies between the two squares
+                    between[row*8 + col][currRow*8 + currCol] = list(ray)
+                    
+                    ray.append((currRow, currCol))
+                    currRow += u[0]
+                    currCol += u[1]
+                
+                squareRays[u] = ray
+            
+            rays.append(squareRays)
+    
+    return knightTargets, kingTargets, pawnTargets, rays, between
+
+
+KNIGHT_TARGETS, KING_TARGETS, PAWN_TARGETS, RAYS, BETWEEN = buildSquareTables()
+
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
 class GameState():
     
     """
     This class stores all the information about the game state. Legal moves, 
-    the board, a log of moves, whose turn it is, etc.
+    the board, a log of moves, whose turn it is, etc. The board class can be
+    swapped out, e.g. for a BitBoard. Any position can be set up from a FEN
+    string, the starting position is used by default.
     """
     
-    def __init__(self):
+    def __init__(self, boardType = None, fen = None):
+        
+        if boardType == None:
+            boardType = Board
+        
+        if fen == None:
+            fen = STARTING_FEN
         
-        self.board = Board()
+        self.board = boardType()
         self.players = ["white", "black"]
         self.turnPlayer = "white"
         self.moveLog = []
@@ -17,63 +138,237 @@ class GameState():
         self.checkmate = False
         self.stalemate = False
         
+        # draws by rule, set together with checkmate and stalemate
+        self.repetition = False
+        self.fiftyMoves = False
+        self.insufficientMaterial = False
+        
         self.activePieces = {p : [] for p in self.players}
         self.capturedPieces = {p : [] for p in self.players}
         self.promotedPawns = {p : [] for p in self.players}
         
-        whiteRook1 = Rook(7, 0, "white")
-        whiteRook2 = Rook(7, 7, "white")
-        whiteKnight1 = Knight(7, 1, "white")
-        whiteKnight2 = Knight(7, 6, "white")
-        whiteBishop1 = Bishop(7, 5, "white")
-        whiteBishop2 = Bishop(7, 2, "white")
-        whiteQueen = Queen(7, 3, "white")
-        whiteKing = King(7, 4, "white")
-        whitePawn1 = Pawn(6, 0, "white")
-        whitePawn2 = Pawn(6, 1, "white")
-        whitePawn3 = Pawn(6, 2, "white")
-        whitePawn4 = Pawn(6, 3, "white")
-        whitePawn5 = Pawn(6, 4, "white")
-        whitePawn6 = Pawn(6, 5, "white")
-        whitePawn7 = Pawn(6, 6, "white")
-        whitePawn8 = Pawn(6, 7, "white")
-        
-        self.activePieces["white"] = [
-            whiteRook1, whiteRook2, whiteKnight1, whiteKnight2,
-            whiteBishop1, whiteBishop2, whiteQueen, whiteKing,
-            whitePawn1, whitePawn2, whitePawn3, whitePawn4,
-            whitePawn5, whitePawn6, whitePawn7, whitePawn8           
-            ]
+        self.kings = {}
+        self.rooks = {p : [] for p in self.players}
         
-        blackRook1 = Rook(0, 0, "black")
-        blackRook2 = Rook(0, 7, "black")
-        blackKnight1 = Knight(0, 1, "black")
-        blackKnight2 = Knight(0, 6, "black")
-        blackBishop1 = Bishop(0, 5, "black")
-        blackBishop2 = Bishop(0, 2, "black")
-        blackQueen = Queen(0, 3, "black")
-        blackKing = King(0, 4, "black")
-        blackPawn1 = Pawn(1, 0, "black")
-        blackPawn2 = Pawn(1, 1, "black")
-        blackPawn3 = Pawn(1, 2, "black")
-        blackPawn4 = Pawn(1, 3, "black")
-        blackPawn5 = Pawn(1, 4, "black")
-        blackPawn6 = Pawn(1, 5, "black")
-        blackPawn7 = Pawn(1, 6, "black")
-        blackPawn8 = Pawn(1, 7, "black")
-        
-        self.activePieces["black"] = [
-            blackRook1, blackRook2, blackKnight1, blackKnight2,
-            blackBishop1, blackBishop2, blackQueen, blackKing,
-            blackPawn1, blackPawn2, blackPawn3, blackPawn4,
-            blackPawn5, blackPawn6, blackPawn7, blackPawn8
-            ]
+        # counters for the fifty move rule and the move number
+        self.halfmoveClock = 0
+        self.fullmoveNumber = 1
+        
+        self.loadFEN(fen)
+        
+        # the position the move log starts from, replaying the logged moves
+        # from it rebuilds the game including its earlier positions
+        self.startFEN = fen
+        
+        self.zobristKey = self.computeZobristKey()
+        
+        # material and piece-square scores, kept in step with performMove
+        # and undoMove like the Zobrist key so evaluation doesn't have to go
+        # through the pieces
+        self.midgameScore, self.endgameScore, self.phase = evaluation.computeScores(self)
+        
+        # keys of the positions after every move and how often each one
+        # occurred, kept in step with performMove and undoMove so repetitions
+        # are found without going through the move log
+        self.positionHistory = [self.repetitionKey()]
+        self.positionCounts = {self.positionHistory[0]: 1}
+        
+        # Zobrist key and player the last attack map was computed for
+        self.attackMapCache = (None, None, None)
+        
+    
+    @classmethod
+    def fromFEN(cls, fen, boardType = None):
+        
+        """
+        Creates a game state from a position in Forsyth-Edwards Notation.
+        """
+        
+        return cls(boardType, fen)
+    
+    
+    def loadFEN(self, fen):
+        
+        """
+        Sets up the pieces, castling state, en passant square, turn player 
+        and move counters of an empty game state from a FEN string. Raises 
+        a ValueError if the string isn't a valid position.
+        """
+        
+        fields = fen.split()
+        
+        if len(fields) < 4:
+            raise ValueError(f"FEN needs at least 4 fields: {fen}")
+        
+        placement, turn, castling, enPassant = fields[:4]
+        ranks = placement.split("/")
+        
+        if len(ranks) != 8:
+            raise ValueError(f"FEN needs 8 ranks: {fen}")
+        
+        for row, rank in enumerate(ranks):
+            
+            col = 0
+            
+            for symbol in rank:
+                
+                if symbol.isdigit():
+                    
+                    col += int(symbol)
+                    continue
+                
+                if symbol.upper() not in FEN_PIECES or col > 7:
+                    raise ValueError(f"Invalid rank {rank} in FEN: {fen}")
+                
+                player = "white" if symbol.isupper() else "black"
+                piece = FEN_PIECES[symbol.upper()](row, col, player)
+                
+                if piece.pieceType == "Pawn" and row in (0, 7):
+                    raise ValueError(f"Pawn on the first or last rank in FEN: {fen}")
+                
+                # pawns that left their starting row can't move 2 squares
+                if piece.pieceType == "Pawn":
+                    piece.hasMoved = row != (6 if player == "white" else 1)
+                
+                if piece.pieceType == "King":
+                    
+                    if player in self.kings:
+                        raise ValueError(f"FEN needs one king per player: {fen}")
+                    
+                    self.kings[player] = piece
+                
+                self.activePieces[player].append(piece)
+                col += 1
+            
+            if col != 8:
+                raise ValueError(f"Invalid rank {rank} in FEN: {fen}")
+        
+        if len(self.kings) != 2:
+            raise ValueError(f"FEN needs one king per player: {fen}")
         
         self.board.addPieces(self.activePieces["white"] + self.activePieces["black"])
         
-        self.kings = {"white": whiteKing, "black": blackKing}
-        self.rooks = {"white": [whiteRook1, whiteRook2],
-                      "black": [blackRook1, blackRook2]}
+        if turn not in ("w", "b"):
+            raise ValueError(f"Invalid turn player in FEN: {fen}")
+        
+        self.turnPlayer = "white" if turn == "w" else "black"
+        
+        # castling rights are kept as whether the king and the rooks on the
+        # corners have moved, every right that's missing is a moved piece
+        for player, homeRow, kingSide, queenSide in [("white", 7, "K", "Q"), 
+                                                     ("black", 0, "k", "q")]:
+            
+            king = self.kings[player]
+            king.hasMoved = True
+            
+            for col, side in [(0, queenSide), (7, kingSide)]:
+                
+                rook = self.board[homeRow, col]
+                
+                if rook == None or rook.pieceType != "Rook" or rook.player != player:
+                    continue
+                
+                self.rooks[player].append(rook)
+                rook.hasMoved = side not in castling
+                
+                if side in castling and king.row == homeRow and king.col == 4:
+                    king.hasMoved = False
+        
+        if enPassant != "-":
+            
+            # the square is behind a pawn of the other player that just
+            # moved 2 squares, so it and the square the pawn came from are
+            # empty
+            rank = "6" if self.turnPlayer == "white" else "3"
+            
+            if len(enPassant) != 2 or enPassant[0] not in "abcdefgh" or enPassant[1] != rank:
+                raise ValueError(f"Invalid en passant square in FEN: {fen}")
+            
+            row = 8 - int(enPassant[1])
+            col = "abcdefgh".index(enPassant[0])
+            d = 1 if self.turnPlayer == "white" else -1
+            pawn = self.board[row + d, col]
+            
+            if pawn == None or pawn.pieceType != "Pawn" or pawn.player == self.turnPlayer or \
+               self.board[row, col] != None or self.board[row - d, col] != None:
+                raise ValueError(f"Invalid en passant square in FEN: {fen}")
+            
+            self.board.enPassantCoordinates = (row, col)
+        
+        # the player who just moved can't have left their king in check
+        self.switchTurn()
+        opponentInCheck = len(self.getChecksAndSetPins(checksOnly = True)) > 0
+        self.switchTurn()
+        
+        if opponentInCheck:
+            raise ValueError(f"Player not to move is in check in FEN: {fen}")
+        
+        if len(fields) >= 6:
+            
+            self.halfmoveClock = int(fields[4])
+            self.fullmoveNumber = int(fields[5])
+        
+        return
+    
+    
+    def toFEN(self):
+        
+        """
+        Returns the current position in Forsyth-Edwards Notation.
+        """
+        
+        ranks = []
+        
+        for row in range(8):
+            
+            rank = ""
+            empty = 0
+            
+            for col in range(8):
+                
+                piece = self.board[row, col]
+                
+                if piece == None:
+                    
+                    empty += 1
+                    continue
+                
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                
+                symbol = str(piece)[1]
+                rank += symbol if piece.player == "white" else symbol.lower()
+            
+            if empty:
+                rank += str(empty)
+            
+            ranks.append(rank)
+        
+        rights = self.castlingRights()
+        castling = ""
+        
+        for right, symbol in [(("white", "0-0"), "K"), (("white", "0-0-0"), "Q"),
+                              (("black", "0-0"), "k"), (("black", "0-0-0"), "q")]:
+            
+            if right in rights:
+                castling += symbol
+        
+        if self.board.enPassantCoordinates:
+            
+            row, col = self.board.enPassantCoordinates
+            enPassant = "abcdefgh"[col] + str(8 - row)
+        
+        else:
+            
+            enPassant = "-"
+        
+        return " ".join(["/".join(ranks), 
+                         "w" if self.turnPlayer == "white" else "b",
+                         castling or "-",
+                         enPassant,
+                         str(self.halfmoveClock),
+                         str(self.fullmoveNumber)])
         
     
     def switchTurn(self):
@@ -86,43 +381,175 @@ class GameState():
                            if player != self.turnPlayer][0]
     
     
+    def castlingRights(self):
+        
+        """
+        Returns a list of (player, side) tuples for every castling right
+        that is still available, i.e. neither the king nor the rook on that
+        side has moved and the rook hasn't been captured.
+        """
+        
+        rights = []
+        
+        for player in self.players:
+            
+            if self.kings[player].hasMoved:
+                continue
+            
+            for r in self.rooks[player]:
+                
+                # a captured rook is no longer on its square
+                if r.hasMoved or self.board[r.row, r.col] is not r:
+                    continue
+                
+                if r.col == 7:
+                    rights.append((player, "0-0"))
+                elif r.col == 0:
+                    rights.append((player, "0-0-0"))
+        
+        return rights
+    
+    
+    def castlingKey(self):
+        
+        """
+        Zobrist key of the castling rights that are still available.
+        """
+        
+        key = 0
+        
+        for right in self.castlingRights():
+            key ^= ZOBRIST_CASTLING[right]
+        
+        return key
+    
+    
+    def computeZobristKey(self):
+        
+        """
+        Computes the Zobrist key of the current position from scratch. The
+        key is updated incrementally when moves are performed, this is used 
+        to initialize it and to verify it.
+        """
+        
+        key = 0
+        
+        for player in self.players:
+            
+            for piece in self.activePieces[player]:
+                
+                key ^= ZOBRIST_PIECES[player, piece.pieceType][piece.row*8 + piece.col]
+        
+        key ^= self.castlingKey()
+        
+        if self.board.enPassantCoordinates:
+            key ^= ZOBRIST_EN_PASSANT[self.board.enPassantCoordinates[1]]
+        
+        if self.turnPlayer == "black":
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        
+        return key
+    
+    
+    def repetitionKey(self):
+        
+        """
+        Zobrist key of the position for finding repetitions. The en passant
+        file is only part of it if a pawn of the turn player can capture
+        there, otherwise the position is the same as without it.
+        """
+        
+        key = self.zobristKey
+        
+        if self.board.enPassantCoordinates:
+            
+            row, col = self.board.enPassantCoordinates
+            
+            # the capturing pawn stands next to the pawn that moved two squares
+            pawnRow = row + 1 if self.turnPlayer == "white" else row - 1
+            
+            for pawnCol in (col - 1, col + 1):
+                
+                if 0 <= pawnCol <= 7:
+                    
+                    piece = self.board[pawnRow, pawnCol]
+                    
+                    if piece != None and piece.pieceType == "Pawn" and piece.player == self.turnPlayer:
+                        return key
+            
+            key ^= ZOBRIST_EN_PASSANT[col]
+        
+        return key
+    
+    
     def performMove(self, move):
         
         """
         Updates information of pieces and board to reflect that a move was
-        performed.
+        performed. The Zobrist key is updated along the way, the previous
+        key is saved in the move for undo.
         """
         
-        promotionDict = {"R": Rook,
-                         "N": Knight,
-                         "B": Bishop,
-                         "Q": Queen}
+        move.previousZobristKey = self.zobristKey
+        move.previousScores = (self.midgameScore, self.endgameScore, self.phase)
+        key = self.zobristKey
+        midgame = self.midgameScore
+        endgame = self.endgameScore
+        
+        # castling rights only change when a king or rook moves or a rook
+        # gets captured
+        updateCastling = move.movedPiece.pieceType in ("King", "Rook") or \
+                         (move.capturedPiece != None and move.capturedPiece.pieceType == "Rook")
+        
+        if updateCastling:
+            key ^= self.castlingKey()
+        
+        player = move.movedPiece.player
+        start = move.startRow*8 + move.startCol
+        key ^= ZOBRIST_PIECES[player, move.movedPiece.pieceType][start]
+        midgame -= evaluation.MIDGAME_SCORES[player, move.movedPiece.pieceType][start]
+        endgame -= evaluation.ENDGAME_SCORES[player, move.movedPiece.pieceType][start]
         
         move.movedPiece.movePiece(move)
         
-        # pawn promotion by replacing pawn with new piece object on the board
+        # pawn promotion by replacing pawn with new piece object on the board,
+        # the move says which piece the pawn becomes
         if move.isPawnPromotion:
             
-            pieceChoice = input("Promote to R, N, B or Q: ").upper()
-            promotedPawn = promotionDict[pieceChoice](move.destinationRow, 
+            promotedPawn = FEN_PIECES[move.promotionPiece](move.destinationRow, 
                                                       move.destinationCol, 
                                                       move.movedPiece.player)
             self.activePieces[move.movedPiece.player].append(promotedPawn)
             self.activePieces[move.movedPiece.player].remove(move.movedPiece)
             self.promotedPawns[move.movedPiece.player].append(move.movedPiece)
             move.movedPiece = promotedPawn
+            self.phase += evaluation.PHASE_WEIGHTS[promotedPawn.pieceType]
         
         self.board.updateMove(move)
         
+        destination = move.destinationRow*8 + move.destinationCol
+        key ^= ZOBRIST_PIECES[player, move.movedPiece.pieceType][destination]
+        midgame += evaluation.MIDGAME_SCORES[player, move.movedPiece.pieceType][destination]
+        endgame += evaluation.ENDGAME_SCORES[player, move.movedPiece.pieceType][destination]
+        
         # if a piece was captured, remove it from the list of active pieces
         if move.capturedPiece != None:
             
             self.activePieces[move.capturedPiece.player].remove(move.capturedPiece)
             self.capturedPieces[move.capturedPiece.player].append(move.capturedPiece)
+            captured = (move.capturedPiece.player, move.capturedPiece.pieceType)
+            square = move.capturedPiece.row*8 + move.capturedPiece.col
+            key ^= ZOBRIST_PIECES[captured][square]
+            midgame -= evaluation.MIDGAME_SCORES[captured][square]
+            endgame -= evaluation.ENDGAME_SCORES[captured][square]
+            self.phase -= evaluation.PHASE_WEIGHTS[move.capturedPiece.pieceType]
         
         # save old en passant coordinates for undo
         move.currEnPassantCoordinates = self.board.enPassantCoordinates
         
+        if move.currEnPassantCoordinates:
+            key ^= ZOBRIST_EN_PASSANT[move.currEnPassantCoordinates[1]]
+        
         # set en passant coordinates
         if move.movedPiece.pieceType == "Pawn" and \
            abs(move.startRow - move.destinationRow) == 2:
@@ -133,10 +560,18 @@ class GameState():
                 d = 1
                 
             self.board.enPassantCoordinates = (move.startRow + d, move.startCol)
+            key ^= ZOBRIST_EN_PASSANT[move.startCol]
         
         else:
             self.board.enPassantCoordinates = ()
         
+        if updateCastling:
+            key ^= self.castlingKey()
+        
+        self.zobristKey = key
+        self.midgameScore = midgame
+        self.endgameScore = endgame
+        
         # castling is two moves in one
         if move.isCastle:
             self.performMove(move.rookMove)
@@ -144,8 +579,25 @@ class GameState():
         # rook move when castling doesn't switch turn
         if not move.isCastleRookMove:
             
+            # pawn moves and captures reset the fifty move counter
+            move.previousHalfmoveClock = self.halfmoveClock
+            
+            if move.movedPiece.pieceType == "Pawn" or move.isPawnPromotion or \
+               move.capturedPiece != None:
+                self.halfmoveClock = 0
+            else:
+                self.halfmoveClock += 1
+            
+            if self.turnPlayer == "black":
+                self.fullmoveNumber += 1
+            
             self.moveLog.append(move)
             self.switchTurn()
+            self.zobristKey ^= ZOBRIST_BLACK_TO_MOVE
+            
+            repetitionKey = self.repetitionKey()
+            self.positionHistory.append(repetitionKey)
+            self.positionCounts[repetitionKey] = self.positionCounts.get(repetitionKey, 0) + 1
         
         return
         
@@ -189,113 +641,399 @@ class GameState():
         
         # rook move when castling doesn't switch turn
         if not lastMove.isCastleRookMove:   
+            
+            key = self.positionHistory.pop()
+            self.positionCounts[key] -= 1
+            
+            if self.positionCounts[key] == 0:
+                del self.positionCounts[key]
+            
             self.switchTurn()
+            self.halfmoveClock = lastMove.previousHalfmoveClock
+            
+            if self.turnPlayer == "black":
+                self.fullmoveNumber -= 1
+        
+        self.zobristKey = lastMove.previousZobristKey
+        self.midgameScore, self.endgameScore, self.phase = lastMove.previousScores
         
         return
     
     
     def generateLegalMoves(self):
-        
+
         """
         Generates all the moves the turn player can make while accounting
-        for checks. Only handles moves of pieces other than The king. 
-        Preventing moves from the king that put the king in check are 
-        handled in the king class.
+        for checks and detects checkmate, stalemate and draws by rule. The
+        moves are returned as a MoveList.
         """
-        
-        moves = []
-        
-        checks = self.getChecksAndSetPins()
-        
-        if self.kings[self.turnPlayer].inCheck == True:
-            
-            # 1 check still allows other pieces to make moves
-            if len(checks) == 1:
-            
-                moves = self.generateAllMoves()
-                validSquares = []
-                
-                checkingPiece = checks[0][0]
-                checkDirection = checks[0][1]
-                
-                # if a non-king piece moves, it must capture checking knight
-                if checkingPiece.pieceType == "Knight":
-            
-                    validSquares = [(checkingPiece.row, checkingPiece.col)]
-                    
-                # pieces other than knights can be blocked or captured
-                else:
-                    
-                    row = self.kings[self.turnPlayer].row
-                    col = self.kings[self.turnPlayer].col
-                    
-                    # squares to block the check or capture attacking piece
-                    while row != checkingPiece.row or col != checkingPiece.col:
-                        
-                        row += checkDirection[0]
-                        col += checkDirection[1]
-                        
-                        validSquares.append((row, col))
-                
-                # remove moves that don't deal with the check
-                for i in range(len(moves) - 1, -1, -1):
-                    
-                    if moves[i].movedPiece.pieceType != "King":
-                        
-                        if not (moves[i].destinationRow, moves[i].destinationCol) in validSquares:
-                            
-                            moves.pop(i)
-                
-            # more than 1 check can only be dealt with by moving the king
-            else:
-                
-                self.kings[self.turnPlayer].appendMoves(self.board, moves, self)
 
-        # king is not in check, all moves are allowed
-        else:
-            
-            moves = self.generateAllMoves()
-        
+        moves = self.generateMoves()
+
+        self.repetition = self.isRepetition()
+        self.fiftyMoves = self.halfmoveClock >= 100
+        self.insufficientMaterial = self.hasInsufficientMaterial()
+
         # if there are no legal moves for the turn player, the game ends
         if len(moves) == 0:
-            
+
             if self.kings[self.turnPlayer].inCheck:
                 self.checkmate = True
             else:
                 self.stalemate = True
-        
+
         # undoing a move can let the game continue
         else:
-            
+
             self.checkmate = False
             self.stalemate = False
 
         return moves
 
 
-    def generateAllMoves(self):
-        
-        """
-        Generates all possible moves for the turn player.
+    def isRepetition(self, count = 3):
+
         """
-        
-        moves = []
-                
-        for piece in self.activePieces[self.turnPlayer]:
-            
-            # calculating king moves requires the game state for checks
-            if piece.pieceType != "King":
-                piece.appendMoves(self.board, moves)
-            else:
-                piece.appendMoves(self, moves)
-                
-        return moves
-    
-    
-    def getChecksAndSetPins(self, checksOnly = False):
-        
+        Checks if the current position occurred at least count times, the
+        same player to move with the same castling and en passant rights.
         """
-        Function that looks for any pins and checks of the turn player. First
+
+        return self.positionCounts.get(self.positionHistory[-1], 0) >= count
+
+
+    def hasInsufficientMaterial(self):
+
+        """
+        Checks if neither player can checkmate anymore: king against king,
+        king and a minor piece against king or king and bishop against king
+        and bishop with the bishops on squares of the same color.
+        """
+
+        # the common case is decided by counting
+        if len(self.activePieces["white"]) + len(self.activePieces["black"]) > 4:
+            return False
+
+        pieces = self.activePieces["white"] + self.activePieces["black"]
+        minors = [piece for piece in pieces if piece.pieceType != "King"]
+
+        if len(minors) == 0:
+            return True
+
+        if any(piece.pieceType not in ("Knight", "Bishop") for piece in minors):
+            return False
+
+        if len(minors) == 1:
+            return True
+
+        if len(minors) == 2 and all(piece.pieceType == "Bishop" for piece in minors) and \
+           minors[0].player != minors[1].player:
+            return (minors[0].row + minors[0].col) % 2 == (minors[1].row + minors[1].col) % 2
+
+        return False
+
+
+    def isDraw(self):
+
+        """
+        Checks if the game is drawn by stalemate, threefold repetition, the
+        fifty move rule or insufficient material. Uses the flags set by
+        generateLegalMoves.
+        """
+
+        if self.checkmate:
+            return False
+
+        return self.stalemate or self.repetition or self.fiftyMoves or self.insufficientMaterial
+
+
+    def generateMoves(self, kind = ALL_MOVES):
+
+        """
+        Generates the legal moves of one kind (ALL_MOVES, CAPTURES or QUIETS)
+        the turn player can make while accounting for checks. Only handles
+        moves of pieces other than The king. Preventing moves from the king
+        that put the king in check are handled in the king class.
+        """
+
+        moves = MoveList()
+
+        checks = self.getChecksAndSetPins()
+
+        if self.kings[self.turnPlayer].inCheck == True:
+
+            # 1 check still allows other pieces to make moves
+            if len(checks) == 1:
+
+                moves = self.generateAllMoves(kind)
+                validSquares = self.blockingSquares(checks[0][0])
+
+                # remove moves that don't deal with the check, en passant
+                # is checked separately below
+                for i in range(len(moves) - 1, -1, -1):
+
+                    if moves[i].movedPiece.pieceType != "King" and not moves[i].isEnPassant:
+
+                        if not (moves[i].destinationRow, moves[i].destinationCol) in validSquares:
+
+                            moves.pop(i)
+
+            # more than 1 check can only be dealt with by moving the king
+            else:
+
+                self.kings[self.turnPlayer].appendMoves(self, moves, kind)
+
+        # king is not in check, all moves are allowed
+        else:
+
+            moves = self.generateAllMoves(kind)
+
+        # en passant removes 2 pieces from the board, pins don't cover that
+        if self.board.enPassantCoordinates:
+
+            for i in range(len(moves) - 1, -1, -1):
+
+                if moves[i].isEnPassant and not self.isLegalEnPassant(moves[i]):
+                    moves.pop(i)
+
+        return moves
+
+
+    def isLegalEnPassant(self, move):
+
+        """
+        Check if an en passant capture leaves the king of the turn player
+        safe. The capture is played on the board and reverted again. Needed
+        since it can uncover a check along the row of both pawns, or capture
+        a pawn that is checking the king.
+        """
+
+        board = self.board
+        pawn = move.movedPiece
+        captured = move.capturedPiece
+        king = self.kings[self.turnPlayer]
+        inCheck = king.inCheck
+
+        board[move.startRow, move.startCol] = None
+        board[captured.row, captured.col] = None
+        board[move.destinationRow, move.destinationCol] = pawn
+
+        checks = self.getChecksAndSetPins(checksOnly = True)
+
+        board[move.destinationRow, move.destinationCol] = None
+        board[captured.row, captured.col] = captured
+        board[move.startRow, move.startCol] = pawn
+
+        king.inCheck = inCheck
+
+        return not checks
+
+
+    def blockingSquares(self, checkingPiece):
+
+        """
+        Returns the set of squares a non-king piece can move to in order to
+        deal with a single check: the square of the checking piece and, if
+        it isn't a knight, the squares between it and the king.
+        """
+
+        king = self.kings[self.turnPlayer]
+
+        validSquares = set(BETWEEN[king.row*8 + king.col]
+                                  [checkingPiece.row*8 + checkingPiece.col])
+        validSquares.add((checkingPiece.row, checkingPiece.col))
+
+        return validSquares
+
+
+    def generateStagedMoves(self, hashMove = 0):
+
+        """
+        Generator over the legal moves of the turn player in stages: the
+        hash move (a moveID, 0 for none) if it's legal, then captures and
+        promotions sorted by most valuable victim and least valuable
+        attacker, then quiet moves. Each stage is only generated once the
+        previous one is used up, so a search that cuts off early never pays
+        for the quiet moves. Moves can be performed and undone in between.
+        checkmate and stalemate are only updated if the generator runs to
+        the end.
+        """
+
+        count = 0
+        hashMoveYielded = False
+
+        if hashMove:
+
+            move = self.legalMoveFromID(hashMove)
+
+            if move != None:
+
+                count += 1
+                hashMoveYielded = True
+                yield move
+
+        for kind in (CAPTURES, QUIETS):
+
+            # pins are recomputed for every stage since moves were performed
+            # and undone in between
+            moves = self.generateMoves(kind)
+
+            if kind == CAPTURES:
+
+                moves.sort(key = lambda m:
+                           (-CAPTURE_ORDER[m.capturedPiece.pieceType] if m.capturedPiece != None else 0,
+                            CAPTURE_ORDER[m.movedPiece.pieceType]))
+
+            for move in moves:
+
+                if hashMoveYielded and move.moveID == hashMove:
+                    continue
+
+                count += 1
+                yield move
+
+        if count == 0:
+
+            if self.kings[self.turnPlayer].inCheck:
+                self.checkmate = True
+            else:
+                self.stalemate = True
+
+        else:
+
+            self.checkmate = False
+            self.stalemate = False
+
+        return
+
+
+    def legalMoveFromID(self, moveID):
+
+        """
+        Returns the legal move with the given moveID, or None if there is no
+        such move. Only the moves of the piece on the start square are
+        generated.
+        """
+
+        start, destination, _ = Move.unpack(moveID)
+        piece = self.board[start]
+
+        if piece == None or piece.player != self.turnPlayer:
+            return None
+
+        checks = self.getChecksAndSetPins()
+
+        # more than 1 check can only be dealt with by moving the king
+        if len(checks) > 1 and piece.pieceType != "King":
+            return None
+
+        moves = []
+
+        if piece.pieceType == "King":
+            piece.appendMoves(self, moves)
+        else:
+            piece.appendMoves(self.board, moves)
+
+        for move in moves:
+
+            if move.moveID != moveID:
+                continue
+
+            if move.isEnPassant:
+                return move if self.isLegalEnPassant(move) else None
+
+            if len(checks) == 1 and piece.pieceType != "King" and \
+               (move.destinationRow, move.destinationCol) not in self.blockingSquares(checks[0][0]):
+                return None
+
+            return move
+
+        return None
+
+
+    def generateAllMoves(self, kind = ALL_MOVES):
+        
+        """
+        Generates all possible moves of one kind for the turn player.
+        """
+        
+        moves = MoveList()
+                
+        for piece in self.activePieces[self.turnPlayer]:
+            
+            # calculating king moves requires the game state for checks
+            if piece.pieceType != "King":
+                piece.appendMoves(self.board, moves, kind)
+            else:
+                piece.appendMoves(self, moves, kind)
+                
+        return moves
+    
+    
+    def attackMap(self, player):
+        
+        """
+        Returns the set of (row, col) squares attacked by the pieces of 
+        player. The king of the other player doesn't block sliding pieces,
+        so squares behind it on an attacking line count as attacked too, 
+        the king can't escape a check by stepping along the line. The map
+        is computed once per position and player, further calls for the 
+        same position are lookups.
+        """
+        
+        if self.attackMapCache[0] == self.zobristKey and \
+           self.attackMapCache[1] == player:
+            return self.attackMapCache[2]
+        
+        board = self.board
+        attacked = set()
+        
+        for piece in self.activePieces[player]:
+            
+            square = piece.row*8 + piece.col
+            pieceType = piece.pieceType
+            
+            if pieceType == "Pawn":
+                attacked.update(PAWN_TARGETS[player][square])
+            
+            elif pieceType == "Knight":
+                attacked.update(KNIGHT_TARGETS[square])
+            
+            elif pieceType == "King":
+                attacked.update(KING_TARGETS[square])
+            
+            else:
+                
+                rays = RAYS[square]
+                
+                for u in piece.unitVectors:
+                    
+                    for target in rays[u]:
+                        
+                        attacked.add(target)
+                        blocker = board[target]
+                        
+                        if blocker != None and not (blocker.pieceType == "King" and 
+                                                    blocker.player != player):
+                            break
+        
+        self.attackMapCache = (self.zobristKey, player, attacked)
+        
+        return attacked
+    
+    
+    def isSquareAttacked(self, row, col, player):
+        
+        """
+        Check if the square at (row, col) is attacked by any piece of player.
+        """
+        
+        return (row, col) in self.attackMap(player)
+    
+    
+    def getChecksAndSetPins(self, checksOnly = False):
+        
+        """
+        Function that looks for any pins and checks of the turn player. First
         check in all linear directions away from the king to cover attack 
         directions of all normal pieces, then check separately for knights.
         Returns a list of tuples containing the checking piece as well as the
@@ -306,99 +1044,85 @@ class GameState():
         moves.
         """
         
-        # all directions from which a Rook, Bishop or Queen could attack
-        unitVectors = [(1, 0), (-1, 0), (0, 1), (0, -1),  
-                       (1, 1), (-1, 1), (1, -1), (-1, -1)]
-        
-        
-        # all relative coordinates from which a knight could attack
-        knightCoordinates = [(2, 1), (-2, 1), (2, -1), (-2, -1), 
-                             (1, 2), (1, -2), (-1, 2), (-1, -2)]
-        
         checks = []
+        board = self.board
+        player = self.turnPlayer
+        king = self.kings[player]
         
         # reset all pins from previous calls
         if not checksOnly:
-            for piece in self.activePieces[self.turnPlayer]:
+            for piece in self.activePieces[player]:
                 piece.resetPin()
         
-        self.kings[self.turnPlayer].inCheck = False
-        row = self.kings[self.turnPlayer].row
-        col = self.kings[self.turnPlayer].col
+        king.inCheck = False
+        kingSquare = king.row*8 + king.col
         
-        # check in all directions away from the king
-        for u in unitVectors:
+        # check in all directions away from the king, from which a Rook, 
+        # Bishop or Queen could attack
+        for u, ray in RAYS[kingSquare].items():
             
             possiblePin = None
             distanceFromKing = 1
-            currRow = row + u[0]
-            currCol = col + u[1]
             
-            while 0 <= currRow <= 7 and 0 <= currCol <= 7:
+            for square in ray:
+                
+                piece = board[square]
+                
+                if piece == None:
+                    
+                    distanceFromKing += 1
+                    continue
                 
-                if self.board.isAlly(currRow, currCol, self.turnPlayer):
+                if piece.player == player:
                     
                     if not possiblePin:
                         
                         # king moves are generated in a way that might make
                         # the king protect itself, this prevents that
-                        if self.board[currRow, currCol].pieceType != "King":
-                            possiblePin = self.board[currRow, currCol]
+                        if piece.pieceType != "King":
+                            possiblePin = piece
                     
                     # 2 allied pieces, no pin or check in that direction
                     else:
                         
                         break
                 
-                elif self.board.isEnemy(currRow, currCol, self.turnPlayer):
+                else:
                     
                     # check if it's a sliding piece that can attack
-                    if u in self.board[currRow, currCol].unitVectors:
+                    if u in piece.unitVectors:
                         
                         # no allied piece is blocking the enemy sliding piece
                         if not possiblePin:
                             
-                            checks.append((self.board[currRow, currCol], u))
-                            break
+                            checks.append((piece, u))
                             
                         # allied piece is blocking the check, it is now pinned
-                        else:
+                        elif not checksOnly:
                             
-                            if not checksOnly:
-                                possiblePin.pinned = True
-                                possiblePin.pinDirection = u
-                            break
+                            possiblePin.pinned = True
+                            possiblePin.pinDirection = u
                     
                     # check if there is a king or pawn that can attack
-                    elif (-u[0], -u[1]) in self.board[currRow, currCol].relativeCoordinates and \
-                         distanceFromKing == 1:
+                    elif distanceFromKing == 1 and \
+                         (-u[0], -u[1]) in piece.relativeCoordinates:
                          
-                        checks.append((self.board[currRow, currCol], u))
-                        break
+                        checks.append((piece, u))
                     
                     # enemy pieces beyond the first in that direction are blocked
-                    else:
-                        
-                        break
+                    break
                     
                 distanceFromKing += 1
-                currRow += u[0]
-                currCol += u[1]
     
     
         # knights move in a special pattern, they also can't pin other pieces
-        for k in knightCoordinates:
+        for square in KNIGHT_TARGETS[kingSquare]:
             
-            currRow = row + k[0]
-            currCol = col + k[1]
+            piece = board[square]
             
-            if 0 <= currRow <= 7 and 0 <= currCol <= 7:
+            if piece != None and piece.player != player and piece.pieceType == "Knight":
                 
-                if self.board.isEnemy(currRow, currCol, self.turnPlayer):    
-                    
-                    if self.board[currRow, currCol].pieceType == "Knight":
-                        
-                        checks.append((self.board[currRow, currCol], k))
+                checks.append((piece, (square[0] - king.row, square[1] - king.col)))
         
         if checks: 
             
@@ -407,6 +1131,32 @@ class GameState():
         return checks
     
     
+def boardString(matrix):
+    
+    """
+    Text version of a board given as an 8x8 list of lists, one row per 
+    line and "em" for empty squares. Shared by Board and BitBoard.
+    """
+    
+    outputString = ""
+    
+    for row in matrix:
+        
+        for element in row:
+            
+            if element != None:    
+            
+                outputString += f"{str(element):4} "
+        
+            else:
+                
+                outputString += f"{'em':4} "
+        
+        outputString += "\n"
+    
+    return outputString
+
+
 class Board():
     
     def __init__(self):
@@ -434,125 +1184,362 @@ class Board():
         return self.matrix[index[0]][index[1]]
     
     
-    def __str__(self):
+    def __str__(self):
+        
+        return boardString(self.matrix)
+    
+    
+    def addPieces(self, pieces):
+        
+        """
+        Adds a list of piece objects to the board, used for setting up 
+        positions.
+        """
+        
+        for piece in pieces:
+            
+            self.matrix[piece.row][piece.col] = piece
+    
+        return
+    
+    
+    def updateMove(self, move):
+        
+        """
+        Updates board with a move.
+        """
+        
+        self.matrix[move.startRow][move.startCol] = None
+        self.matrix[move.destinationRow][move.destinationCol] = move.movedPiece
+        if move.isEnPassant:
+            self.matrix[move.capturedPiece.row][move.capturedPiece.col] = None
+        
+        return
+    
+    
+    def updateUndo(self, move):
+        
+        """
+        Reverts board back to before a move was performed.
+        """
+        
+        self.matrix[move.startRow][move.startCol] = move.movedPiece
+        if not move.isEnPassant:
+            self.matrix[move.destinationRow][move.destinationCol] = move.capturedPiece
+        else:
+            self.enPassantCoordinates = (move.destinationRow, move.destinationCol)
+            self.matrix[move.destinationRow][move.destinationCol] = None
+            self.matrix[move.capturedPiece.row][move.capturedPiece.col] = move.capturedPiece
+        
+        return
+    
+    
+    def isEmpty(self, row, col):
+        
+        """
+        Check if the square at (row, col) is unoccupied.
+        """
+        
+        return self.matrix[row][col] == None
+    
+    
+    def isEnemy(self, row, col, player):
+        
+        """
+        Check if the square at (row, col) is occupied by an enemy piece.
+        """
+        
+        if self.isEmpty(row, col):
+            
+            return False
+        
+        else:
+            
+            return self.matrix[row][col].player != player
+
+    
+    def isAlly(self, row, col, player):
+        
+        """
+        Check if the square at (row, col) is occupied by an allied piece.
+        """
+        
+        if self.isEmpty(row, col):
+            
+            return False
+        
+        else:
+            
+            return self.matrix[row][col].player == player
+
+
+class BitBoard():
+
+    """
+    Alternative to Board that stores the position as 64 bit integers, one
+    per piece type and player, plus occupancy masks per player. It has the
+    same interface as Board, so it can be passed to a GameState in its
+    place. Piece objects are still kept in a flat list of squares since
+    the game state and the pieces work with them directly.
+
+    It exists for exporting positions as bitboards (batch.toBitboards) and
+    for checking move generation against Board, not for speed. Nothing in
+    the engine reads the masks, and keeping them up to date makes perft
+    about 10% slower than with Board.
+    """
+
+    def __init__(self):
+
+        self.squares = [None] * 64
+        self.pieces = {(player, pieceType): 0
+                       for player in ["white", "black"]
+                       for pieceType in ["Pawn", "Rook", "Knight", "Bishop", "Queen", "King"]}
+        self.occupancy = {"white": 0, "black": 0}
+        self.occupied = 0
+
+        self.enPassantCoordinates = ()
+
+
+    def __setitem__(self, index, value):
+
+        square = index[0]*8 + index[1]
+
+        self.removePiece(square)
+
+        if value != None:
+            self.placePiece(square, value)
+
+
+    def __getitem__(self, index):
+
+        return self.squares[index[0]*8 + index[1]]
+
+
+    def __str__(self):
+
+        return boardString(self.matrix)
+
+
+    @property
+    def matrix(self):
+
+        """
+        The board as an 8x8 list of lists, same layout as Board.matrix.
+        """
+
+        return [self.squares[row*8 : row*8 + 8] for row in range(8)]
+
+
+    def placePiece(self, square, piece):
+
+        """
+        Puts a piece on an empty square and sets its bits.
+        """
+
+        bit = 1 << square
+
+        self.squares[square] = piece
+        self.pieces[piece.player, piece.pieceType] |= bit
+        self.occupancy[piece.player] |= bit
+        self.occupied |= bit
+
+        return
+
+
+    def removePiece(self, square):
+
+        """
+        Removes whatever piece is on a square and clears its bits.
+        """
+
+        piece = self.squares[square]
+
+        if piece == None:
+            return
+
+        bit = ~(1 << square)
+
+        self.squares[square] = None
+        self.pieces[piece.player, piece.pieceType] &= bit
+        self.occupancy[piece.player] &= bit
+        self.occupied &= bit
+
+        return
+
+
+    def addPieces(self, pieces):
+
+        """
+        Adds a list of piece objects to the board.
+        """
+
+        for piece in pieces:
+
+            self[piece.row, piece.col] = piece
+
+        return
+
+
+    def updateMove(self, move):
+
+        """
+        Updates board with a move.
+        """
+
+        if move.isEnPassant:
+            self.removePiece(move.capturedPiece.row*8 + move.capturedPiece.col)
+
+        destination = move.destinationRow*8 + move.destinationCol
+
+        # the moved piece may differ from the one on the start square when a
+        # pawn gets promoted
+        self.removePiece(move.startRow*8 + move.startCol)
+        self.removePiece(destination)
+        self.placePiece(destination, move.movedPiece)
+
+        return
+
+
+    def updateUndo(self, move):
+
+        """
+        Reverts board back to before a move was performed.
+        """
+
+        self.removePiece(move.destinationRow*8 + move.destinationCol)
+        self.placePiece(move.startRow*8 + move.startCol, move.movedPiece)
+
+        if move.isEnPassant:
+            self.enPassantCoordinates = (move.destinationRow, move.destinationCol)
+
+        if move.capturedPiece != None:
+            self.placePiece(move.capturedPiece.row*8 + move.capturedPiece.col,
+                            move.capturedPiece)
+
+        return
+
+
+    def isEmpty(self, row, col):
+
+        """
+        Check if the square at (row, col) is unoccupied.
+        """
+
+        return not (self.occupied >> (row*8 + col)) & 1
+
+
+    def isEnemy(self, row, col, player):
+
+        """
+        Check if the square at (row, col) is occupied by an enemy piece.
+        """
+
+        return bool(((self.occupied ^ self.occupancy[player]) >> (row*8 + col)) & 1)
+
+
+    def isAlly(self, row, col, player):
+
+        """
+        Check if the square at (row, col) is occupied by an allied piece.
+        """
+
+        return bool((self.occupancy[player] >> (row*8 + col)) & 1)
+
+
+class MoveList(list):
+    
+    """
+    List of moves that can also be looked up by start square and by moveID
+    in constant time. The lookups are built the first time they're needed,
+    so generating moves that are only iterated over costs nothing extra. 
+    The list shouldn't be changed after the first lookup.
+    """
+    
+    def __init__(self, moves = ()):
         
-        outputString = ""
+        super().__init__(moves)
         
-        for row in self.matrix:
-            
-            for element in row:
-                
-                if element != None:    
-                
-                    outputString += f"{str(element):4} "
-            
-                else:
-                    
-                    outputString += f"{'em':4} "
-            
-            outputString += "\n"
-        
-        return outputString
+        self.byStart = None
+        self.byID = None
     
     
-    def addPieces(self, pieces):
-        
-        """
-        Adds a list of piece objects to the board, maybe useful for loading
-        chess puzzles in the future.
-        """
+    def __contains__(self, move):
         
-        for piece in pieces:
-            
-            self.matrix[piece.row][piece.col] = piece
-    
-        return
+        return self.find(move) != None
     
     
-    def updateMove(self, move):
+    def buildIndex(self):
         
         """
-        Updates board with a move.
+        Builds the lookups by start square and by moveID.
         """
         
-        self.matrix[move.startRow][move.startCol] = None
-        self.matrix[move.destinationRow][move.destinationCol] = move.movedPiece
-        if move.isEnPassant:
-            self.matrix[move.capturedPiece.row][move.capturedPiece.col] = None
-        
-        return
-    
-    
-    def updateUndo(self, move):
-        
-        """
-        Reverts board back to before a move was performed.
-        """
+        self.byStart = {}
+        self.byID = {}
         
-        self.matrix[move.startRow][move.startCol] = move.movedPiece
-        if not move.isEnPassant:
-            self.matrix[move.destinationRow][move.destinationCol] = move.capturedPiece
-        else:
-            self.enPassantCoordinates = (move.destinationRow, move.destinationCol)
-            self.matrix[move.destinationRow][move.destinationCol] = None
-            self.matrix[move.capturedPiece.row][move.capturedPiece.col] = move.capturedPiece
+        for move in self:
+            
+            self.byStart.setdefault((move.startRow, move.startCol), []).append(move)
+            self.byID[move.moveID] = move
         
         return
     
     
-    def isEmpty(self, row, col):
-        
-        """
-        Check if the square at (row, col) is unoccupied.
-        """
-        
-        return self.matrix[row][col] == None
-    
-    
-    def isEnemy(self, row, col, player):
+    def find(self, move):
         
         """
-        Check if the square at (row, col) is occupied by an enemy piece.
+        Returns the move of the list that is equal to move, i.e. has the same
+        start and destination squares, or None if there is none. Useful for 
+        getting the fully generated move from one built out of clicks.
         """
         
-        if self.isEmpty(row, col):
-            
-            return False
+        if self.byID == None:
+            self.buildIndex()
         
-        else:
-            
-            return self.matrix[row][col].player != player
-
+        return self.byID.get(move.moveID)
     
-    def isAlly(self, row, col, player):
+    
+    def movesFrom(self, row, col):
         
         """
-        Check if the square at (row, col) is occupied by an allied piece.
+        Returns a list of all moves starting on the square at (row, col).
         """
         
-        if self.isEmpty(row, col):
-            
-            return False
+        if self.byStart == None:
+            self.buildIndex()
         
-        else:
-            
-            return self.matrix[row][col].player == player
-    
+        return self.byStart.get((row, col), [])
     
+
 class Move():
     
     """
     This class is responsible for calculating moves of pieces, it also stores
     the information about which piece was moved and which piece was captured,
-    if any.
+    if any. Moves are compared and hashed by their moveID, an integer that 
+    packs the start square, the destination square and the promotion piece.
     """
     
+    # a lot of moves are created during move generation, slots keep them small
+    __slots__ = ("startRow", "startCol", "destinationRow", "destinationCol",
+                 "movedPiece", "capturedPiece", "isCastle", "isCastleRookMove",
+                 "isPawnPromotion", "promotionPiece", "isEnPassant", "currEnPassantCoordinates",
+                 "previousZobristKey", "previousScores", "previousHalfmoveClock", "firstMove",
+                 "moveID")
+    
     colToRank = {0: "a", 1: "b", 2: "c", 3: "d", 4: "e", 5: "f", 6: "g", 7: "h"}
     rowToFile = {0: 8, 1: 7, 2: 6, 3: 5, 4: 4, 5: 3, 6: 2, 7: 1}
     
+    # pieces a pawn can be promoted to, in the order they are generated, and
+    # their code in the moveID
+    promotionPieces = ("Q", "R", "B", "N")
+    promotionCodes = {None: 0, "N": 1, "B": 2, "R": 3, "Q": 4}
+    promotionFromCode = {code: piece for piece, code in promotionCodes.items()}
+    
     def __init__(self, start, destination, board, 
                  pawnpromotion = False,
-                 enpassant = False):
+                 enpassant = False,
+                 promotion = "Q"):
                 
         self.startRow, self.startCol = start
         self.destinationRow, self.destinationCol = destination
@@ -565,10 +1552,16 @@ class Move():
         self.isCastleRookMove = False
         
         self.isPawnPromotion = pawnpromotion
+        self.promotionPiece = promotion if pawnpromotion else None
         
         self.isEnPassant = enpassant
         self.currEnPassantCoordinates = ()
         
+        # restored when the move is undone
+        self.previousZobristKey = 0
+        self.previousScores = None
+        self.previousHalfmoveClock = 0
+        
         if self.isEnPassant: 
             
             if self.movedPiece.player == "white": 
@@ -582,9 +1575,10 @@ class Move():
         if self.movedPiece != None:
             self.firstMove = not self.movedPiece.hasMoved
         
-        # for comparisons and move log output
-        self.moveID = str(self.startRow) + str(self.startCol) \
-                      + str(self.destinationRow) + str(self.destinationCol)
+        # for comparisons, hashing and the transposition table
+        self.moveID = (self.startRow*8 + self.startCol) \
+                      | (self.destinationRow*8 + self.destinationCol) << 6 \
+                      | self.promotionCodes[self.promotionPiece] << 12
     
     
     def __str__(self):
@@ -600,8 +1594,44 @@ class Move():
         
         else:
             
-            raise TypeError("Comparison between move and " + type(other) + " not supported.")
-
+            return NotImplemented
+    
+    
+    def __hash__(self):
+        
+        return self.moveID
+    
+    
+    @staticmethod
+    def unpack(moveID):
+        
+        """
+        Splits a moveID into the start and destination coordinates and the
+        promotion piece, None if the move isn't a promotion.
+        """
+        
+        start = moveID & 0x3F
+        destination = moveID >> 6 & 0x3F
+        promotion = Move.promotionFromCode[moveID >> 12 & 0x7]
+        
+        return (start // 8, start % 8), (destination // 8, destination % 8), promotion
+    
+    
+    def coordinateNotation(self):
+        
+        """
+        Get the coordinate notation of a move, e.g. e2e4 or e7e8q for a
+        promotion.
+        """
+        
+        notation = self.colToRank[self.startCol] + str(self.rowToFile[self.startRow]) \
+                   + self.colToRank[self.destinationCol] + str(self.rowToFile[self.destinationRow])
+        
+        if self.isPawnPromotion:
+            notation += self.promotionPiece.lower()
+        
+        return notation
+    
     
     def chessNotation(self):
         
@@ -624,11 +1654,11 @@ class Move():
         if self.isPawnPromotion:
             
             if capture:
-                notation = startRank + "x" + endRank + endFile + str(self.movedPiece)[1]
+                notation = startRank + "x" + endRank + endFile + self.promotionPiece
             else:
-                notation = endRank + endFile + str(self.movedPiece)[1]
+                notation = endRank + endFile + self.promotionPiece
             
-        if self.movedPiece.pieceType != "Pawn":
+        elif self.movedPiece.pieceType != "Pawn":
             
             if capture:
                 notation = piece + "x" + endRank + endFile
@@ -647,6 +1677,8 @@ class Move():
 
 class Castle(Move):
     
+    __slots__ = ("side", "rookMove")
+    
     def __init__(self, start, destination, board, side):
         
         super().__init__(start, destination, board)
@@ -709,50 +1741,53 @@ class Piece():
         self.hasMoved = not move.firstMove
         
     
-    def slidingMoves(self, board, pattern):
+    def slidingMoves(self, board, pattern, kind = ALL_MOVES):
         
         """
         Blueprint for calculating moves of Rooks, Bishops and Queens. They
-        cannot jump over other pieces.
+        cannot jump over other pieces. kind selects captures, quiet moves or 
+        all of them.
         """
         
         moves = []
+        start = (self.row, self.col)
+        rays = RAYS[self.row*8 + self.col]
         
-        for u in self.unitVectors:
+        for u in pattern:
             
             # pinned sliding pieces can only move along the line of the pin
             if self.pinned and self.pinDirection != u and self.pinDirection != (-u[0], -u[1]):
                 continue
             
-            destRow = self.row + u[0]
-            destCol = self.col + u[1]
-            
-            while 0 <= destRow <= 7 and 0 <= destCol <= 7:
+            for destination in rays[u]:
                 
-                if board.isEmpty(destRow, destCol):
+                piece = board[destination]
+                
+                if piece == None:
                     
-                    moves.append(Move((self.row, self.col), (destRow, destCol), board))
+                    if kind != CAPTURES:
+                        moves.append(Move(start, destination, board))
                 
-                elif board.isEnemy(destRow, destCol, self.player):
+                elif piece.player != self.player:
                     
-                    moves.append(Move((self.row, self.col), (destRow, destCol), board))
+                    if kind != QUIETS:
+                        moves.append(Move(start, destination, board))
                     break
                 
                 else:
                     
                     break
-                
-                destRow += u[0]
-                destCol += u[1]
 
         return moves
         
     
-    def singleCoordinateMoves(self, board, relativeCoordinates):
+    def singleCoordinateMoves(self, board, targets, kind = ALL_MOVES):
         
         """
         Blueprint for calculating moves of Knights and Kings. Knights can 
-        jump over other pieces.
+        jump over other pieces. targets is the precomputed table of target
+        squares of the piece type, kind selects captures, quiet moves or all
+        of them.
         """
         
         moves = []
@@ -761,16 +1796,21 @@ class Piece():
         if self.pinned:
             return moves
         
-        for c in relativeCoordinates:
+        start = (self.row, self.col)
+        
+        for destination in targets[self.row*8 + self.col]:
             
-            destRow = self.row + c[0]
-            destCol = self.col + c[1]
+            piece = board[destination]
             
-            if 0 <= destRow <= 7 and 0 <= destCol <= 7:
+            if piece == None:
                 
-                if not board.isAlly(destRow, destCol, self.player):
-                    
-                    moves.append(Move((self.row, self.col), (destRow, destCol), board))
+                if kind != CAPTURES:
+                    moves.append(Move(start, destination, board))
+            
+            elif piece.player != self.player:
+                
+                if kind != QUIETS:
+                    moves.append(Move(start, destination, board))
         
         return moves
     
@@ -797,30 +1837,44 @@ class Pawn(Piece):
         self.peaceful = (d, 0)                        # non-capturing
         
     
-    def appendMoves(self, board, moves):
+    def appendMoves(self, board, moves, kind = ALL_MOVES):
         
         """
-        Appends all moves the pawn can make from its current position on the
-        board to the list moves.
+        Appends all moves of one kind the pawn can make from its current 
+        position on the board to the list moves. Promotions count as 
+        captures.
         """
         
         u = self.peaceful[0]
         
+        # pawns are promoted when they reach the other end of the board
+        pawnpromotion = self.row+u == 7 or self.row+u == 0
+        
         # pinned pawns can only move along the line of the pin
         if not self.pinned or self.pinDirection == self.peaceful or \
             self.pinDirection == (-self.peaceful[0], self.peaceful[1]):
             
             if board.isEmpty(self.row + u, self.col):
                 
-                pawnpromotion = self.row+u == 7 or self.row+u == 0
+                if pawnpromotion and kind != QUIETS:
+                    
+                    # one move for every piece the pawn can be promoted to
+                    for promotion in Move.promotionPieces:
+                        
+                        moves.append(Move((self.row, self.col), 
+                                          (self.row+u, self.col), 
+                                          board, 
+                                          pawnpromotion,
+                                          promotion = promotion))
                 
-                moves.append(Move((self.row, self.col), 
-                                  (self.row+u, self.col), 
-                                  board, 
-                                  pawnpromotion))
+                elif not pawnpromotion and kind != CAPTURES:
+                    
+                    moves.append(Move((self.row, self.col), 
+                                      (self.row+u, self.col), 
+                                      board))
                 
                 # pawns can move 2 squares if they haven't moved yet
-                if not self.hasMoved:
+                if not self.hasMoved and kind != CAPTURES:
                        
                        if board.isEmpty(self.row + 2 * u, self.col):
                            
@@ -829,6 +1883,9 @@ class Pawn(Piece):
                                              board))
     
         
+        if kind == QUIETS:
+            return
+        
         # capturing
         for c in self.relativeCoordinates:
             
@@ -838,9 +1895,6 @@ class Pawn(Piece):
             
             destRow = self.row + c[0]
             destCol = self.col + c[1]
-            
-            # pawns are promoted when they reach the other end of the board
-            pawnpromotion = self.row+u == 7 or self.row+u == 0
         
             if 0 <= destRow <= 7 and 0 <= destCol <= 7:
                 
@@ -850,11 +1904,23 @@ class Pawn(Piece):
                     # is this move an en passant
                     enpassant = board.enPassantCoordinates == (destRow, destCol)
                     
-                    moves.append(Move((self.row, self.col), 
-                                      (destRow, destCol), 
-                                      board,
-                                      pawnpromotion,
-                                      enpassant))
+                    if pawnpromotion:
+                        
+                        for promotion in Move.promotionPieces:
+                            
+                            moves.append(Move((self.row, self.col), 
+                                              (destRow, destCol), 
+                                              board,
+                                              pawnpromotion,
+                                              promotion = promotion))
+                    
+                    else:
+                        
+                        moves.append(Move((self.row, self.col), 
+                                          (destRow, destCol), 
+                                          board,
+                                          pawnpromotion,
+                                          enpassant))
                     
         return
     
@@ -866,14 +1932,14 @@ class Rook(Piece):
         super().__init__("Rook", row, col, player)
         self.unitVectors = [(1, 0), (-1, 0), (0, 1), (0, -1)]
 
-    def appendMoves(self, board, moves):
+    def appendMoves(self, board, moves, kind = ALL_MOVES):
         
         """
-        Appends all moves the rook can make from its current position on the
-        board to the list moves.
+        Appends all moves of one kind the rook can make from its current 
+        position on the board to the list moves.
         """
 
-        moves += self.slidingMoves(board, self.unitVectors)
+        moves += self.slidingMoves(board, self.unitVectors, kind)
 
         return
 
@@ -885,14 +1951,14 @@ class Bishop(Piece):
         super().__init__("Bishop", row, col, player)
         self.unitVectors = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
 
-    def appendMoves(self, board, moves):
+    def appendMoves(self, board, moves, kind = ALL_MOVES):
         
         """
-        Appends all moves the bishop can make from its current position on the
-        board to the list moves.
+        Appends all moves of one kind the bishop can make from its current 
+        position on the board to the list moves.
         """
 
-        moves += self.slidingMoves(board, self.unitVectors)
+        moves += self.slidingMoves(board, self.unitVectors, kind)
 
         return
 
@@ -905,14 +1971,14 @@ class Queen(Piece):
         self.unitVectors = [(1, 0), (-1, 0), (0, 1), (0, -1),
                             (1, 1), (-1, 1), (1, -1), (-1, -1)]
     
-    def appendMoves(self, board, moves):
+    def appendMoves(self, board, moves, kind = ALL_MOVES):
         
         """
-        Appends all moves the queen can make from its current position on the
-        board to the list moves.
+        Appends all moves of one kind the queen can make from its current 
+        position on the board to the list moves.
         """
 
-        moves += self.slidingMoves(board, self.unitVectors)
+        moves += self.slidingMoves(board, self.unitVectors, kind)
 
         return
 
@@ -930,14 +1996,14 @@ class Knight(Piece):
         return self.player[0] + "N"
     
     
-    def appendMoves(self, board, moves):
+    def appendMoves(self, board, moves, kind = ALL_MOVES):
         
         """
-        Appends all moves the knight can make from its current position on the
-        board to the list moves.
+        Appends all moves of one kind the knight can make from its current 
+        position on the board to the list moves.
         """
     
-        moves += self.singleCoordinateMoves(board, self.relativeCoordinates)
+        moves += self.singleCoordinateMoves(board, KNIGHT_TARGETS, kind)
                     
         return
 
@@ -952,135 +2018,275 @@ class King(Piece):
         self.inCheck = False
                 
     
-    def appendMoves(self, gamestate, moves):
+    def appendMoves(self, gamestate, moves, kind = ALL_MOVES):
         
         """
-        Appends all moves the king can make from its current position on the
-        board to the list moves.
+        Appends all moves of one kind the king can make from its current 
+        position on the board to the list moves. Castling is a quiet move.
         """
         
-        kingMoves = self.singleCoordinateMoves(gamestate.board, self.relativeCoordinates)
+        kingMoves = self.singleCoordinateMoves(gamestate.board, KING_TARGETS, kind)
         
-        for i in range(len(kingMoves) - 1, -1, -1):
-            
-            # perform the move and save the current inCheck value
-            self.row = kingMoves[i].destinationRow
-            self.col = kingMoves[i].destinationCol
-            previousCheckState = self.inCheck
-            
-            # check if that move leaves the king in check
-            gamestate.getChecksAndSetPins(checksOnly = True)
-            
-            # revert back to original position
-            self.row = kingMoves[i].startRow
-            self.col = kingMoves[i].startCol
-            
-            # remove the move if the king is in check
-            if self.inCheck:
-                kingMoves.pop(i)
-            
-            # revert to previous inCheck value
-            self.inCheck = previousCheckState
+        # the king can't move to a square attacked by the opponent
+        opponent = "black" if self.player == "white" else "white"
+        attacked = gamestate.attackMap(opponent)
         
-        moves += kingMoves + self.castling(gamestate)
+        moves += [m for m in kingMoves 
+                  if (m.destinationRow, m.destinationCol) not in attacked]
+        
+        if kind != CAPTURES:
+            moves += self.castling(gamestate, attacked)
                     
         return
     
     
-    def castling(self, gamestate):
+    def castling(self, gamestate, attacked):
         
         """
         Checks whether castling is possible, return list of castling moves
-        that can be performed.
+        that can be performed. attacked is the set of squares attacked by 
+        the opponent.
         """
         
         castlingMoves = []
-        castleQueenSide = False
-        castleKingSide = False
-        
-        rooks = gamestate.rooks[self.player]
         
         # can't castle if king is in check or has moved
         if self.inCheck or self.hasMoved:
              return castlingMoves
         
         # can't castle on a side if respective rook has moved (or is captured)
-        for r in rooks:
-            
-            if r.hasMoved:
-                continue
-            
-            if r in gamestate.capturedPieces[self.player]:
-                continue
-            
-            else:
-                if r.col == 0:
-                    castleQueenSide = True
+        rights = gamestate.castlingRights()
+        castleQueenSide = (self.player, "0-0-0") in rights
+        castleKingSide = (self.player, "0-0") in rights
+        
+        board = gamestate.board
+        
+        # squares between king and rook must be empty, the king can't pass 
+        # through or land on an attacked square, the square next to the queen
+        # side rook doesn't matter for that
+        if castleQueenSide and \
+           all(board.isEmpty(self.row, c) for c in range(1, 4)) and \
+           not any((self.row, c) in attacked for c in range(2, 4)):
                 
-                elif r.col == 7:
-                    castleKingSide = True
+            castlingMoves.append(Castle((self.row, self.col), 
+                                        (self.row, self.col - 2), 
+                                        board, 
+                                        "0-0-0"))    
+
+        if castleKingSide and \
+           all(board.isEmpty(self.row, c) for c in range(5, 7)) and \
+           not any((self.row, c) in attacked for c in range(5, 7)):
+                
+            castlingMoves.append(Castle((self.row, self.col), 
+                                        (self.row, self.col + 2), 
+                                        board, 
+                                        "0-0"))    
+        
+        return castlingMoves
+
+
+# piece classes by their letter in FEN, upper case
+FEN_PIECES = {"P": Pawn, "R": Rook, "N": Knight, "B": Bishop, "Q": Queen, "K": King}
+
+class Instrumentation():
+    
+    """
+    Opt-in counters and timers for the hot paths of the engine. While it's
+    disabled the methods are the plain ones, enabling it replaces them on
+    their classes with wrappers that count the calls and measure the time,
+    disabling it puts the originals back. Time is measured inclusive of
+    everything a method calls and exclusive of the instrumented methods it
+    calls, so the exclusive times show where the time actually goes. Only
+    one thread should run the engine while it's enabled. Can be used as a
+    context manager.
+    """
+    
+    def __init__(self):
+        
+        self.enabled = False
+        self.originals = []
+        
+        # time spent in instrumented calls below each running call
+        self.stack = []
+        
+        self.reset()
+        
+    
+    def __enter__(self):
+        
+        self.enable()
+        
+        return self
+    
+    
+    def __exit__(self, *exception):
+        
+        self.disable()
+        
+        return False
+    
+    
+    def reset(self):
+        
+        """
+        Clears all counters and timers.
+        """
+        
+        self.calls = {}
+        self.inclusive = {}
+        self.exclusive = {}
+        
+        return
+    
+    
+    def targets(self):
+        
+        """
+        Returns the instrumented methods as (class, method name, label)
+        tuples. getChecksAndSetPins gets one label per value of checksOnly.
+        """
+        
+        targets = [(GameState, "generateLegalMoves", "GameState.generateLegalMoves"),
+                   (GameState, "generateMoves", "GameState.generateMoves"),
+                   (GameState, "generateAllMoves", "GameState.generateAllMoves"),
+                   (GameState, "getChecksAndSetPins", "GameState.getChecksAndSetPins"),
+                   (GameState, "performMove", "GameState.performMove"),
+                   (GameState, "undoMove", "GameState.undoMove"),
+                   (Move, "__init__", "Move.__init__")]
+        
+        for pieceClass in FEN_PIECES.values():
+            targets.append((pieceClass, "appendMoves", pieceClass.__name__ + ".appendMoves"))
+        
+        return targets
+    
+    
+    def enable(self):
+        
+        """
+        Replaces the instrumented methods with counting wrappers.
+        """
+        
+        if self.enabled:
+            return
+        
+        for cls, name, label in self.targets():
+            
+            original = cls.__dict__[name]
+            self.originals.append((cls, name, original))
+            setattr(cls, name, self.wrap(original, label))
+        
+        self.enabled = True
+        
+        return
+    
+    
+    def disable(self):
+        
+        """
+        Puts the original methods back, the counters are kept.
+        """
+        
+        for cls, name, original in self.originals:
+            setattr(cls, name, original)
+        
+        self.originals = []
+        self.enabled = False
+        
+        return
+    
+    
+    def wrap(self, function, label):
+        
+        """
+        Returns a wrapper of a method that counts its calls and times them
+        under label.
+        """
         
+        perfCounter = time.perf_counter
+        stack = self.stack
         
-        if castleQueenSide:
+        # check detection and pin scans are told apart
+        split = function.__name__ == "getChecksAndSetPins"
+        
+        def wrapper(*args, **kwargs):
             
-            castlePossible = True
-            coordinates = [(self.row, c) for c in range(1,4)]
+            key = label
             
-            # square to the right of the queen side rook is empty
-            for coordinate in coordinates:
-                
-                # can't castle if enemy piece between king and rook
-                if not gamestate.board.isEmpty(*coordinate):
-                    castlePossible = False
-                    break
-                
-                self.col = coordinate[1] 
-                
-                gamestate.getChecksAndSetPins(checksOnly = True)
-                
-                # can't castle if the king would be in check on either of the
-                # 2 squares to its left, the 3rd square doesn't matter
-                if self.inCheck and not self.col == 1:
-                    castlePossible = False
-                    break
-                
-            self.col = 4
-            self.inCheck = False
+            if split:
+                checksOnly = kwargs.get("checksOnly", args[1] if len(args) > 1 else False)
+                key = f"{label}(checksOnly={bool(checksOnly)})"
             
-            if castlePossible:
-                
-                castlingMoves.append(Castle((self.row, self.col), 
-                                           (self.row, self.col - 2), 
-                                           gamestate.board, 
-                                           "0-0-0"))    
-
-        if castleKingSide:
+            stack.append(0.0)
+            start = perfCounter()
             
-            castlePossible = True
-            coordinates = [(self.row, c) for c in range(5,7)]
-
-            for coordinate in coordinates:
-                
-                if not gamestate.board.isEmpty(*coordinate):
-                    castlePossible = False
-                    break
-                
-                self.col = coordinate[1] 
+            try:
+                return function(*args, **kwargs)
+            
+            finally:
                 
-                gamestate.getChecksAndSetPins(checksOnly = True)
+                elapsed = perfCounter() - start
+                children = stack.pop()
                 
-                if self.inCheck:
-                    castlePossible = False
-                    break
+                if stack:
+                    stack[-1] += elapsed
                 
-            self.col = 4
-            self.inCheck = False
+                self.calls[key] = self.calls.get(key, 0) + 1
+                self.inclusive[key] = self.inclusive.get(key, 0.0) + elapsed
+                self.exclusive[key] = self.exclusive.get(key, 0.0) + elapsed - children
+        
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        wrapper.__wrapped__ = function
+        
+        return wrapper
+    
+    
+    def snapshot(self):
+        
+        """
+        Returns the counters as a dictionary of label and a dictionary with
+        the number of calls and the inclusive and exclusive time in seconds.
+        """
+        
+        return {key: {"calls": self.calls[key],
+                      "inclusive": self.inclusive[key],
+                      "exclusive": self.exclusive[key]}
+                for key in sorted(self.calls)}
+    
+    
+    def toJSON(self):
+        
+        """
+        Returns the snapshot as a JSON string.
+        """
+        
+        return json.dumps(self.snapshot(), indent = 2)
+    
+    
+    def report(self, file = None):
+        
+        """
+        Prints the counters as a table, the most exclusive time first.
+        """
+        
+        if file == None:
+            file = sys.stdout
+        
+        snapshot = self.snapshot()
+        total = sum(entry["exclusive"] for entry in snapshot.values())
+        
+        print(f"{'method':48} {'calls':>10} {'inclusive':>10} {'exclusive':>10} "
+              f"{'share':>6} {'us/call':>8}", file = file)
+        
+        for key, entry in sorted(snapshot.items(), key = lambda item: -item[1]["exclusive"]):
             
-            if castlePossible:
-                
-                castlingMoves.append(Castle((self.row, self.col), 
-                                           (self.row, self.col + 2), 
-                                           gamestate.board, 
-                                           "0-0"))    
+            share = 100 * entry["exclusive"] / total if total > 0 else 0.0
+            
+            print(f"{key:48} {entry['calls']:10} {entry['inclusive']:9.3f}s "
+                  f"{entry['exclusive']:9.3f}s {share:5.1f}% "
+                  f"{1e6 * entry['inclusive'] / entry['calls']:8.2f}", file = file)
         
-        return castlingMoves
\ No newline at end of file
+        return
+
+
+INSTRUMENTATION = Instrumentation()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import engine
+import search
+import transposition
+
+
+# the search runs in a background thread on its own copy of the game, the
+# window keeps drawing the game it shows while the copy is searched. Every
+# job gets a generation number, results of older generations are stale
+
+
+class EngineWorker():
+
+    """
+    Searches positions for the GUI in a background thread. Results and the
+    output of every finished iteration are handed to deliver, which is
+    called from the worker thread with the kind of message ("info" or
+    "move"), the generation of the job and the payload: the iteration as
+    a string for "info", the moveID of the best move (None if there is
+    none) for "move".
+    """
+
+    def __init__(self, deliver, depth = 64, timeLimit = 2.0, hashMB = 16):
+
+        self.deliver = deliver
+        self.depth = depth
+        self.timeLimit = timeLimit
+
+        # the table is kept between moves, only one job runs at a time
+        self.table = transposition.TranspositionTable(hashMB)
+
+        self.generation = 0
+        self.thread = None
+        self.searcher = None
+
+
+    def start(self, fen, moveIDs):
+
+        """
+        Cancels the running job and starts searching the position reached by
+        playing the moves, given as moveIDs, from the position in FEN.
+        Playing the moves instead of copying the position keeps the history
+        for repetitions. Returns the generation of the new job.
+        """
+
+        self.cancel()
+
+        self.searcher = search.Search(self.table)
+        self.thread = threading.Thread(target = self.run,
+                                       args = (self.generation, self.searcher, fen, moveIDs),
+                                       daemon = True)
+        self.thread.start()
+
+        return self.generation
+
+
+    def cancel(self):
+
+        """
+        Stops the running job, if any, and makes its results stale. Waits
+        for the thread to finish, which takes at most a few thousand nodes.
+        """
+
+        self.generation += 1
+
+        if self.searcher != None:
+            self.searcher.stop()
+
+        if self.thread != None:
+            self.thread.join()
+
+        self.thread = None
+        self.searcher = None
+
+        return
+
+
+    def run(self, generation, searcher, fen, moveIDs):
+
+        """
+        Thread function, searches one position and delivers the results as
+        long as the job is current.
+        """
+
+        gamestate = engine.GameState.fromFEN(fen)
+
+        for moveID in moveIDs:
+            gamestate.performMove(gamestate.legalMoveFromID(moveID))
+
+        def info(result):
+
+            if generation == self.generation:
+                self.deliver("info", generation, str(result))
+
+        result = searcher.search(gamestate, self.depth, self.timeLimit, info = info)
+
+        if generation == self.generation:
+
+            moveID = result.bestMove.moveID if result != None and result.bestMove != None else None
+            self.deliver("move", generation, moveID)
+
+        return
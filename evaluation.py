@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+
+# material value of each piece type in centipawns
+PIECE_VALUES = {"Pawn": 100,
+                "Knight": 320,
+                "Bishop": 330,
+                "Rook": 500,
+                "Queen": 900,
+                "King": 0}
+
+# how much each piece counts towards the game phase, all pieces of the
+# starting position add up to MAX_PHASE, no pieces besides kings and pawns
+# is the endgame
+PHASE_WEIGHTS = {"Pawn": 0,
+                 "Knight": 1,
+                 "Bishop": 1,
+                 "Rook": 2,
+                 "Queen": 4,
+                 "King": 0}
+
+MAX_PHASE = 24
+
+
+# piece-square tables in centipawns from white's point of view, laid out
+# like the board: the first row is the 8th rank. Pieces other than pawns
+# and kings use the same table in the middlegame and the endgame
+PAWN_MIDGAME = [  0,   0,   0,   0,   0,   0,   0,   0,
+                 50,  50,  50,  50,  50,  50,  50,  50,
+                 10,  10,  20,  30,  30,  20,  10,  10,
+                  5,   5,  10,  25,  25,  10,   5,   5,
+                  0,   0,   0,  20,  20,   0,   0,   0,
+                  5,  -5, -10,   0,   0, -10,  -5,   5,
+                  5,  10,  10, -20, -20,  10,  10,   5,
+                  0,   0,   0,   0,   0,   0,   0,   0]
+
+PAWN_ENDGAME = [  0,   0,   0,   0,   0,   0,   0,   0,
+                 80,  80,  80,  80,  80,  80,  80,  80,
+                 50,  50,  50,  50,  50,  50,  50,  50,
+                 30,  30,  30,  30,  30,  30,  30,  30,
+                 15,  15,  15,  15,  15,  15,  15,  15,
+                  5,   5,   5,   5,   5,   5,   5,   5,
+                  0,   0,   0,   0,   0,   0,   0,   0,
+                  0,   0,   0,   0,   0,   0,   0,   0]
+
+KNIGHT_TABLE = [-50, -40, -30, -30, -30, -30, -40, -50,
+                -40, -20,   0,   0,   0,   0, -20, -40,
+                -30,   0,  10,  15,  15,  10,   0, -30,
+                -30,   5,  15,  20,  20,  15,   5, -30,
+                -30,   0,  15,  20,  20,  15,   0, -30,
+                -30,   5,  10,  15,  15,  10,   5, -30,
+                -40, -20,   0,   5,   5,   0, -20, -40,
+                -50, -40, -30, -30, -30, -30, -40, -50]
+
+BISHOP_TABLE = [-20, -10, -10, -10, -10, -10, -10, -20,
+                -10,   0,   0,   0,   0,   0,   0, -10,
+                -10,   0,   5,  10,  10,   5,   0, -10,
+                -10,   5,   5,  10,  10,   5,   5, -10,
+                -10,   0,  10,  10,  10,  10,   0, -10,
+                -10,  10,  10,  10,  10,  10,  10, -10,
+                -10,   5,   0,   0,   0,   0,   5, -10,
+                -20, -10, -10, -10, -10, -10, -10, -20]
+
+ROOK_TABLE = [  0,   0,   0,   0,   0,   0,   0,   0,
+                5,  10,  10,  10,  10,  10,  10,   5,
+               -5,   0,   0,   0,   0,   0,   0,  -5,
+               -5,   0,   0,   0,   0,   0,   0,  -5,
+               -5,   0,   0,   0,   0,   0,   0,  -5,
+               -5,   0,   0,   0,   0,   0,   0,  -5,
+               -5,   0,   0,   0,   0,   0,   0,  -5,
+                0,   0,   0,   5,   5,   0,   0,   0]
+
+QUEEN_TABLE = [-20, -10, -10,  -5,  -5, -10, -10, -20,
+               -10,   0,   0,   0,   0,   0,   0, -10,
+               -10,   0,   5,   5,   5,   5,   0, -10,
+                -5,   0,   5,   5,   5,   5,   0,  -5,
+                 0,   0,   5,   5,   5,   5,   0,  -5,
+               -10,   5,   5,   5,   5,   5,   0, -10,
+               -10,   0,   5,   0,   0,   0,   0, -10,
+               -20, -10, -10,  -5,  -5, -10, -10, -20]
+
+# the king hides behind its pawns while there are pieces to attack it and
+# walks to the center once they are gone
+KING_MIDGAME = [-30, -40, -40, -50, -50, -40, -40, -30,
+                -30, -40, -40, -50, -50, -40, -40, -30,
+                -30, -40, -40, -50, -50, -40, -40, -30,
+                -30, -40, -40, -50, -50, -40, -40, -30,
+                -20, -30, -30, -40, -40, -30, -30, -20,
+                -10, -20, -20, -20, -20, -20, -20, -10,
+                 20,  20,   0,   0,   0,   0,  20,  20,
+                 20,  30,  10,   0,   0,  10,  30,  20]
+
+KING_ENDGAME = [-50, -40, -30, -20, -20, -30, -40, -50,
+                -30, -20, -10,   0,   0, -10, -20, -30,
+                -30, -10,  20,  30,  30,  20, -10, -30,
+                -30, -10,  30,  40,  40,  30, -10, -30,
+                -30, -10,  30,  40,  40,  30, -10, -30,
+                -30, -10,  20,  30,  30,  20, -10, -30,
+                -30, -30,   0,   0,   0,   0, -30, -30,
+                -50, -30, -30, -30, -30, -30, -30, -50]
+
+PIECE_TABLES = {"Pawn": (PAWN_MIDGAME, PAWN_ENDGAME),
+                "Knight": (KNIGHT_TABLE, KNIGHT_TABLE),
+                "Bishop": (BISHOP_TABLE, BISHOP_TABLE),
+                "Rook": (ROOK_TABLE, ROOK_TABLE),
+                "Queen": (QUEEN_TABLE, QUEEN_TABLE),
+                "King": (KING_MIDGAME, KING_ENDGAME)}
+
+
+def buildScoreTables():
+
+    """
+    Combines material and piece-square tables into the score of a piece on
+    a square, one table for the middlegame and one for the endgame per
+    player and piece type. Scores are from white's point of view, so black
+    pieces are negative. Black uses the white tables mirrored vertically.
+    """
+
+    midgame = {}
+    endgame = {}
+
+    for pieceType, (midgameTable, endgameTable) in PIECE_TABLES.items():
+
+        value = PIECE_VALUES[pieceType]
+
+        midgame["white", pieceType] = [value + midgameTable[square] for square in range(64)]
+        endgame["white", pieceType] = [value + endgameTable[square] for square in range(64)]
+        midgame["black", pieceType] = [-value - midgameTable[square ^ 56] for square in range(64)]
+        endgame["black", pieceType] = [-value - endgameTable[square ^ 56] for square in range(64)]
+
+    return midgame, endgame
+
+
+MIDGAME_SCORES, ENDGAME_SCORES = buildScoreTables()
+
+
+def computeScores(gamestate):
+
+    """
+    Adds up the middlegame score, endgame score and phase of all pieces of
+    a game state. The game state keeps these up to date with every move,
+    this is only needed to set them up and to check them.
+    """
+
+    midgame = 0
+    endgame = 0
+    phase = 0
+
+    for player in gamestate.players:
+
+        for piece in gamestate.activePieces[player]:
+
+            square = piece.row*8 + piece.col
+            midgame += MIDGAME_SCORES[player, piece.pieceType][square]
+            endgame += ENDGAME_SCORES[player, piece.pieceType][square]
+            phase += PHASE_WEIGHTS[piece.pieceType]
+
+    return midgame, endgame, phase
+
+
+def taper(midgame, endgame, phase):
+
+    """
+    Blends the middlegame and endgame score by the game phase. Promotions
+    can push the phase above MAX_PHASE, it's capped there.
+    """
+
+    phase = min(phase, MAX_PHASE)
+
+    return (midgame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+def evaluate(gamestate):
+
+    """
+    Static evaluation of a game state in centipawns, from the point of view
+    of the turn player. Positive scores are good for the turn player. Uses
+    the scores the game state keeps up to date, so it doesn't depend on
+    the number of pieces.
+    """
+
+    score = taper(gamestate.midgameScore, gamestate.endgameScore, gamestate.phase)
+
+    if gamestate.turnPlayer == "white":
+        return score
+
+    return -score
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 
 import pygame as p
-import itertools
+
+import engine
 
 def loadImages():
     
@@ -25,75 +26,157 @@ def loadImages():
     images["frame"] = p.image.load("images/frame.png")
     
     return images
+
+
+class RenderCache():
+    
+    """
+    Surfaces that only depend on the size of the squares, built once 
+    instead of every frame: the pieces scaled to a square, the frame with
+    the empty board, the highlighting squares and the end of game images.
+    The pieces are converted to the pixel format of the window, so the 
+    window has to be created first.
+    """
+    
+    highlightColors = ["red", "yellow", "blue", "green"]
+    
+    def __init__(self, images, totalWidth, totalHeight, SQUARE_SIZE, BORDERS, DIM):
+        
+        self.images = images
+        self.totalWidth = totalWidth
+        self.totalHeight = totalHeight
+        self.borders = BORDERS
+        self.dim = DIM
+        
+        self.squareSize = None
+        self.resize(SQUARE_SIZE)
+    
+    
+    def resize(self, SQUARE_SIZE):
+        
+        """
+        Rebuilds the surfaces for a new square size, does nothing if the size
+        didn't change.
+        """
+        
+        if SQUARE_SIZE == self.squareSize:
+            return
+        
+        self.squareSize = SQUARE_SIZE
+        size = (SQUARE_SIZE, SQUARE_SIZE)
+        
+        self.pieces = {}
+        
+        for name, image in self.images.items():
+            
+            if len(name) == 2:
+                self.pieces[name] = p.transform.scale(image.convert_alpha(), size)
+        
+        self.highlights = {}
+        
+        for color in self.highlightColors:
+            
+            highlightedSquare = p.Surface(size).convert()
+            highlightedSquare.fill(p.Color(color))
+            highlightedSquare.set_alpha(70)
+            self.highlights[color] = highlightedSquare
+        
+        # frame around the board and the board itself
+        
+        self.background = p.Surface((self.totalWidth, self.totalHeight)).convert()
+        self.background.fill(p.Color("white"))
+        self.background.blit(self.images["frame"], (0, 0))
+        
+        boardColors = [p.Color("light gray"), p.Color("dark gray")] 
+        
+        for row in range(self.dim):
+            
+            for col in range(self.dim):
+                
+                color = boardColors[((row + col) % 2)]
+                square = p.Rect(col*SQUARE_SIZE+self.borders["l"], row*SQUARE_SIZE+self.borders["t"], 
+                                SQUARE_SIZE, SQUARE_SIZE)
+                p.draw.rect(self.background, color, square)
+        
+        # end of game images cover the middle of the board
+        
+        width = SQUARE_SIZE * self.dim
+        endgameSize = (int(width * 0.8), int(width * 0.4))
+        
+        self.endgame = {}
+        
+        for result in ["whitewins", "blackwins", "stalemate"]:
+            self.endgame[result] = p.transform.scale(self.images[result].convert_alpha(), endgameSize)
+        
+        return
      
    
-def drawGameState(window, gamestate, legalMoves, selectedSquare, images, font,
-                  totalWidth, totalHeight, HEIGHT, SQUARE_SIZE, BORDERS, DIM):
+def drawGameState(window, gamestate, legalMoves, selectedSquare, renderCache, moveLogView,
+                  SQUARE_SIZE, BORDERS, DIM):
     
     """
-    Draws a given game state in the window.
+    Draws a given game state in the window. Everything that doesn't change
+    between frames comes prepared from the render cache.
     """
     
-    # frame around the board
+    renderCache.resize(SQUARE_SIZE)
     
-    frameRect = p.Rect(0, 0, totalWidth, totalHeight)
-    frame = images["frame"]
-    window.blit(frame, frameRect)
+    # frame and the empty board in one go
     
-    # drawing the board itself
+    window.blit(renderCache.background, (0, 0))
     
-    boardColors = [p.Color("light gray"), p.Color("dark gray")] 
+    drawBoard(window, gamestate, legalMoves, selectedSquare, renderCache, SQUARE_SIZE, BORDERS, DIM)
+            
+    # drawing the move log
     
-    for row in range(DIM):
+    drawMoveLog(window, gamestate, moveLogView)
+        
+    return
 
-        for col in range(DIM):
-            
-            color = boardColors[((row + col) % 2)]
-            square = p.Rect(col*SQUARE_SIZE+BORDERS["l"], row*SQUARE_SIZE+BORDERS["t"], SQUARE_SIZE, SQUARE_SIZE)
-            p.draw.rect(window, color, square)
+
+def drawBoard(window, gamestate, legalMoves, selectedSquare, renderCache, SQUARE_SIZE, BORDERS, DIM):
+    
+    """
+    Draws only the board of a game state with its highlighting and pieces,
+    the rest of the window is left as it is. Returns the rectangle of the
+    board so just that part of the display can be updated.
+    """
+    
+    renderCache.resize(SQUARE_SIZE)
+    
+    # the empty board from the background
+    
+    boardRect = p.Rect(BORDERS["l"], BORDERS["t"], SQUARE_SIZE*DIM, SQUARE_SIZE*DIM)
+    window.blit(renderCache.background, boardRect, boardRect)
     
     # highlighting
     
-    highlightMoves(window, gamestate, legalMoves, selectedSquare, SQUARE_SIZE, BORDERS)
+    highlightMoves(window, gamestate, legalMoves, selectedSquare, renderCache, SQUARE_SIZE, BORDERS)
     
-    # drawing the pieces on the board
+    # drawing the pieces on the board, only the squares with a piece
     
-    for row in range(DIM):
+    for player in gamestate.players:
         
-        for col in range(DIM):
+        for piece in gamestate.activePieces[player]:
             
-            currentSquare = gamestate.board[row, col]
-            
-            if currentSquare == None:
-                continue
-            
-            square = p.Rect(col*SQUARE_SIZE+BORDERS["l"], row*SQUARE_SIZE+BORDERS["t"], SQUARE_SIZE, SQUARE_SIZE)
-            piece = p.transform.scale(images[str(currentSquare)], (SQUARE_SIZE, SQUARE_SIZE))
-            window.blit(piece, square)
-            
-    # drawing the move log
+            window.blit(renderCache.pieces[str(piece)], 
+                        (piece.col*SQUARE_SIZE+BORDERS["l"], piece.row*SQUARE_SIZE+BORDERS["t"]))
     
-    drawMoveLog(window, gamestate, font, totalWidth, HEIGHT, BORDERS)
-        
-    return
+    return boardRect
 
 
-def highlightMoves(window, gamestate, legalMoves, selectedSquare, SQUARE_SIZE, BORDERS):
+def highlightMoves(window, gamestate, legalMoves, selectedSquare, renderCache, SQUARE_SIZE, BORDERS):
     
     """
     Highlights selected squares if a turn player's piece is on it and the 
     squares that piece can move to.
     """
     
-    # surface for highlighting squares
-    highlightedSquare = p.Surface((SQUARE_SIZE, SQUARE_SIZE))
-    highlightedSquare.set_alpha(70)
-    
     # highlighting the king if it's in check
     
     if gamestate.kings[gamestate.turnPlayer].inCheck:
         
-        highlightedSquare.fill(p.Color("red"))
+        highlightedSquare = renderCache.highlights["red"]
         king = gamestate.kings[gamestate.turnPlayer]
         
         kingCoordinates = (king.col*SQUARE_SIZE+BORDERS["l"], 
@@ -105,7 +188,7 @@ def highlightMoves(window, gamestate, legalMoves, selectedSquare, SQUARE_SIZE, B
     if gamestate.moveLog:
         
         lastMove = gamestate.moveLog[-1]
-        highlightedSquare.fill(p.Color("yellow"))
+        highlightedSquare = renderCache.highlights["yellow"]
         
         moveStart = (lastMove.destinationCol*SQUARE_SIZE+BORDERS["l"], 
                      lastMove.destinationRow*SQUARE_SIZE+BORDERS["t"])
@@ -125,91 +208,226 @@ def highlightMoves(window, gamestate, legalMoves, selectedSquare, SQUARE_SIZE, B
 
     # highlighting selected piece
     
-    highlightedSquare.fill(p.Color("blue"))
+    highlightedSquare = renderCache.highlights["blue"]
     pieceCoordinates = (col*SQUARE_SIZE+BORDERS["l"], row*SQUARE_SIZE+BORDERS["t"])
     window.blit(highlightedSquare, pieceCoordinates)
     
     # highlighting the piece's possible moves
     
-    highlightedSquare.fill(p.Color("green"))
+    highlightedSquare = renderCache.highlights["green"]
+    
+    # promotions are four moves to the same square, the translucent
+    # highlight is drawn once per square so it doesn't get darker
+    destinations = {(move.destinationRow, move.destinationCol) 
+                    for move in legalMoves.movesFrom(row, col)}
     
-    for move in legalMoves:
+    for destinationRow, destinationCol in destinations:
         
-        if move.startRow == row and move.startCol == col:
-            
-            moveCoordinates = (move.destinationCol*SQUARE_SIZE+BORDERS["l"], 
-                               move.destinationRow*SQUARE_SIZE+BORDERS["t"])
-            window.blit(highlightedSquare, moveCoordinates)
+        moveCoordinates = (destinationCol*SQUARE_SIZE+BORDERS["l"], 
+                           destinationRow*SQUARE_SIZE+BORDERS["t"])
+        window.blit(highlightedSquare, moveCoordinates)
     
     return
 
 
-def drawMoveLog(window, gamestate, font, totalWidth, HEIGHT, BORDERS):
+class MoveLogView():
     
     """
-    Draws the move log of a game state.
+    The move log next to the board. Every line of turns is rendered once
+    and kept as a surface, when moves are made or undone only the lines
+    from the first changed move on are rendered again. Only the lines that
+    fit into the panel are drawn, it scrolls along with the game unless the
+    player scrolled back.
     """
     
-    moveLogX = totalWidth-BORDERS["r"] + 25
-    moveLogY = BORDERS["t"]
-    moveLogWidth = BORDERS["r"] - 50
-    moveLogHeight = HEIGHT
+    gap = 12
+    turnsPerLine = 4
+    leftMargin = 5
     
-    # erase previous move log
-    logRect = p.Rect(moveLogX, moveLogY, moveLogWidth, moveLogHeight)
-    window.fill(p.Color("white"), logRect)
+    def __init__(self, font, rect):
+        
+        self.font = font
+        self.rect = rect
+        
+        # moves the lines were rendered for and the rendered lines
+        self.moves = []
+        self.lines = []
+        
+        self.top = 0
+        self.following = True
     
-    if not gamestate.moveLog:
-        return
     
-    gap = 12
+    def visibleLines(self):
+        
+        return self.rect.height // self.gap
     
-    logText = []
     
-    # convert the move log to strings of turns
-    for i in range(0, len(gamestate.moveLog), 2):
+    def maxTop(self):
         
-        turn = str(i//2 + 1) + ". " + str(gamestate.moveLog[i]) + " "
+        return max(0, len(self.lines) - self.visibleLines())
+    
+    
+    def update(self, moveLog):
+        
+        """
+        Renders the lines that changed since the last update. Returns
+        whether anything changed.
+        """
+        
+        if len(moveLog) == len(self.moves) and (not moveLog or moveLog[-1] is self.moves[-1]):
+            return False
+        
+        # moves are only made and undone at the end of the log, so the part
+        # both logs have in common is found from the end
+        common = min(len(moveLog), len(self.moves))
+        
+        while common > 0 and moveLog[common - 1] is not self.moves[common - 1]:
+            common -= 1
+        
+        del self.moves[common:]
+        self.moves.extend(moveLog[common:])
+        
+        pliesPerLine = 2 * self.turnsPerLine
+        firstLine = common // pliesPerLine
+        
+        del self.lines[firstLine:]
         
-        if i+1 < len(gamestate.moveLog):
+        for start in range(firstLine * pliesPerLine, len(self.moves), pliesPerLine):
             
-            turn += str(gamestate.moveLog[i+1]) + " "
+            turns = []
+            
+            # convert the moves of the line to strings of turns
+            for i in range(start, min(start + pliesPerLine, len(self.moves)), 2):
+                
+                turn = str(i//2 + 1) + ". " + str(self.moves[i]) + " "
+                
+                if i+1 < len(self.moves):
+                    
+                    turn += str(self.moves[i+1]) + " "
+                
+                turns.append(turn)
+            
+            self.lines.append(self.font.render("".join(turns), True, p.Color("black"), p.Color("white")))
+        
+        if self.following:
+            self.top = self.maxTop()
+        
+        self.top = min(self.top, self.maxTop())
         
-        logText.append(turn)
+        return True
     
-    # taken from https://docs.python.org/3/library/itertools.html#itertools-recipes
-    def grouper(iterable, n, *, incomplete='fill', fillvalue=" "):
+    
+    def scroll(self, lines):
+        
+        """
+        Scrolls the log by a number of lines, negative numbers scroll back.
+        Scrolling to the end follows the game again.
+        """
         
-        args = [iter(iterable)] * n
-        return itertools.zip_longest(*args, fillvalue=fillvalue)
+        self.top = max(0, min(self.top + lines, self.maxTop()))
+        self.following = self.top == self.maxTop()
+        
+        return
     
-    turnsPerLine = 4
-    currLine = 0
-    leftMargin = 5
     
-    for line in grouper(logText, turnsPerLine):
+    def draw(self, window):
         
-        text = font.render("".join(line), True, p.Color("black"))
-        textBox = p.Rect(moveLogX+leftMargin, moveLogY+currLine*gap, moveLogWidth, gap)
-        window.blit(text, textBox)
-        currLine += 1
+        """
+        Draws the visible lines of the log.
+        """
+        
+        # erase previous move log
+        window.fill(p.Color("white"), self.rect)
+        
+        for currLine, text in enumerate(self.lines[self.top:self.top + self.visibleLines()]):
+            
+            window.blit(text, (self.rect.x + self.leftMargin, self.rect.y + currLine*self.gap))
+        
+        return
+
+
+def drawMoveLog(window, gamestate, moveLogView):
+    
+    """
+    Draws the move log of a game state. Returns the rectangle of the log so
+    just that part of the display can be updated.
+    """
+    
+    moveLogView.update(gamestate.moveLog)
+    moveLogView.draw(window)
+    
+    return moveLogView.rect
+
+
+def promotionSquares(move):
+    
+    """
+    Squares (row, col) of the promotion picker for a promotion move, one per
+    piece in the order of Move.promotionPieces. They start at the 
+    destination of the pawn and go towards the middle of the board.
+    """
+    
+    d = 1 if move.destinationRow == 0 else -1
+    
+    return [(move.destinationRow + i*d, move.destinationCol) 
+            for i in range(len(engine.Move.promotionPieces))]
+
+
+def drawPromotionPicker(window, promotionChoices, renderCache, SQUARE_SIZE, BORDERS):
+    
+    """
+    Draws the pieces a pawn can be promoted to on top of the board, the 
+    player picks one by clicking on it.
+    """
+    
+    player = promotionChoices[0].movedPiece.player
+    
+    for move, (row, col) in zip(promotionChoices, promotionSquares(promotionChoices[0])):
         
+        square = p.Rect(col*SQUARE_SIZE+BORDERS["l"], row*SQUARE_SIZE+BORDERS["t"], SQUARE_SIZE, SQUARE_SIZE)
+        window.fill(p.Color("white"), square)
+        p.draw.rect(window, p.Color("dark gray"), square, 1)
+        
+        window.blit(renderCache.pieces[player[0] + move.promotionPiece], square)
+    
     return
 
 
-def drawGameoverText(window, result, images, WIDTH, BORDERS):
+def drawGameoverText(window, result, renderCache, WIDTH, BORDERS):
     
     """
     Displays the end of game screen when called.
     """
     
+    halfBoardX = WIDTH/2 + BORDERS["l"]
+    halfBoardY = WIDTH/2 + BORDERS["t"]
+    
+    endgametext = renderCache.endgame[result]
+    window.blit(endgametext, endgametext.get_rect(center = (halfBoardX, halfBoardY)))
+    
+    return
+
+
+def drawDrawText(window, reason, font, WIDTH, BORDERS):
+    
+    """
+    Displays the end of game screen for a draw by rule together with the
+    rule that ended the game.
+    """
+    
     halfBoardX = WIDTH/2 + BORDERS["l"]
     halfBoardY = WIDTH/2 + BORDERS["t"]
     size = (WIDTH * 0.8, WIDTH * 0.4)
     centeredposition = (halfBoardX - size[0]/2, halfBoardY - size[1]/2)
     
     endgamesurface = p.Rect(*centeredposition, *size)
-    endgametext = p.transform.scale(images[result], size)
-    window.blit(endgametext, endgamesurface)
+    window.fill(p.Color("white"), endgamesurface)
+    p.draw.rect(window, p.Color("black"), endgamesurface, 2)
     
-    return
\ No newline at end of file
+    for i, line in enumerate(["draw", reason]):
+        
+        text = font.render(line, True, p.Color("black"))
+        textBox = text.get_rect(center = (halfBoardX, halfBoardY + (i - 0.5) * font.get_linesize()))
+        window.blit(text, textBox)
+    
+    return
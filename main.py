@@ -4,6 +4,7 @@ import pygame as p
 import math
 
 import engine
+import engineworker
 import graphics
 
 
@@ -20,10 +21,14 @@ def main():
     totalHeight = WIDTH + BORDERS["t"] + BORDERS["b"]
     window = p.display.set_mode((totalWidth, totalHeight))
     window.fill(p.Color("white"))
-    clock = p.time.Clock()
     
-    # font for the move log
+    # font for the move log, the lines of the log are rendered by the view
     font = p.font.Font("fonts/Segoe UI.ttf", 12)
+    moveLogRect = p.Rect(totalWidth - BORDERS["r"] + 25, BORDERS["t"], BORDERS["r"] - 50, HEIGHT)
+    moveLogView = graphics.MoveLogView(font, moveLogRect)
+    
+    # font for draws, they don't have an image
+    drawFont = p.font.Font("fonts/Segoe UI.ttf", 32)
     
     # generate initial gamestate
     gamestate = engine.GameState()
@@ -33,31 +38,117 @@ def main():
     # load images here, only needs to be done once
     images = graphics.loadImages()
     
+    # scaled pieces and the empty board, built once for the square size
+    renderCache = graphics.RenderCache(images, totalWidth, totalHeight, SQUARE_SIZE, BORDERS, DIM)
+    
     selectedSquare = ()
     moveCoordinates = []
     
+    # moves of a pawn waiting for the player to pick a promotion piece
+    promotionChoices = []
+    
+    # the engine searches in a background thread, its results come back as
+    # events so they wake up the loop like any input
+    def deliver(kind, generation, payload):
+        
+        p.event.post(p.event.Event(ENGINE_EVENT, kind = kind, generation = generation, 
+                                   payload = payload))
+    
+    worker = engineworker.EngineWorker(deliver, timeLimit = ENGINE_TIME)
+    
+    # players the engine moves for, e toggles the turn player
+    enginePlayers = set()
+    engineThinking = False
+    
     active = True
     gameover = False
     
-    # start running the game, this section is executed once per frame
+    # parts of the window that have to be drawn again, everything at first
+    repaint = True
+    dirtyBoard = True
+    dirtyLog = True
+    
+    # mouse movement isn't used, it would only wake up the loop
+    p.event.set_blocked(p.MOUSEMOTION)
+    
+    # start running the game, this section is executed once per batch of
+    # events. The engine's output is posted as events too, so nothing
+    # changes on the screen without one
     while active:
         
+        # the first frame is drawn right away
+        if repaint:
+            
+            events = p.event.get()
+        
+        # sleep until something happens instead of drawing the same frame
+        # over and over
+        else:
+            
+            events = [p.event.wait()] + p.event.get()
+        
         # event queue
-        for event in p.event.get():
+        for event in events:
             
             # stop the while loop if the user exits the game
             if event.type == p.QUIT:
                 
                 active = False
             
-            # mouse presses
-            if event.type == p.MOUSEBUTTONDOWN and not gameover:
+            # the window was uncovered or changed, its content may be lost
+            if event.type in (p.VIDEOEXPOSE, p.WINDOWEXPOSED, p.WINDOWRESTORED, 
+                              p.WINDOWSIZECHANGED):
+                
+                repaint = True
+            
+            # results of the engine, older jobs were cancelled and are ignored.
+            # The search progress it reports as "info" isn't shown
+            if event.type == ENGINE_EVENT and event.generation == worker.generation:
+                
+                if event.kind == "move":
+                    
+                    engineThinking = False
+                    
+                    # no move if there was nothing to choose from
+                    if event.payload != None:
+                        
+                        gamestate.performMove(gamestate.legalMoveFromID(event.payload))
+                        newGameState = True
+                        dirtyBoard = True
+            
+            # the mouse wheel scrolls the move log
+            if event.type == p.MOUSEWHEEL:
+                
+                moveLogView.scroll(-event.y)
+                dirtyLog = True
+            
+            # mouse presses, the wheel also sends buttons 4 and 5
+            if event.type == p.MOUSEBUTTONDOWN and event.button not in (4, 5) and not gameover and \
+               gamestate.turnPlayer not in enginePlayers:
+                
+                dirtyBoard = True
                 
                 clickCoordinates = p.mouse.get_pos()
                 clickY = math.floor((clickCoordinates[0] - BORDERS["l"]) / SQUARE_SIZE)
                 clickX = math.floor((clickCoordinates[1] - BORDERS["t"]) / SQUARE_SIZE)
                 mouseClick = (clickY, clickX)
                 
+                # the promotion picker takes the click, anywhere else cancels it
+                if promotionChoices:
+                    
+                    squares = graphics.promotionSquares(promotionChoices[0])
+                    
+                    if (mouseClick[1], mouseClick[0]) in squares:
+                        
+                        move = promotionChoices[squares.index((mouseClick[1], mouseClick[0]))]
+                        gamestate.performMove(move)
+                        newGameState = True
+                    
+                    promotionChoices = []
+                    selectedSquare = ()
+                    moveCoordinates = []
+                    continue
+                
                 # unselecting by clicking again
                 if mouseClick == selectedSquare:
                     
@@ -75,14 +166,24 @@ def main():
                     
                     move = engine.Move(*moveCoordinates, gamestate.board)
                     
-                    # check of the move complies with the rules
-                    if move in legalMoves: 
+                    # get the move generated by the engine's functions for
+                    # legal moves, needed for pawn promotion, etc. None if
+                    # the move doesn't comply with the rules
+                    legalMove = legalMoves.find(move)
+                    
+                    # promotions have one move per piece, the player picks
+                    # one of them on the board without blocking the window
+                    choices = [m for m in legalMoves.movesFrom(move.startRow, move.startCol)
+                               if m.isPawnPromotion and 
+                               (m.destinationRow, m.destinationCol) == (move.destinationRow, move.destinationCol)]
+                    
+                    if choices:
                         
-                        # get the move generated by the engine's functions for
-                        # legal moves, needed for pawn promotion, etc.
-                        move = legalMoves[legalMoves.index(move)]
+                        promotionChoices = choices
+                    
+                    elif legalMove != None: 
                         
-                        gamestate.performMove(move)
+                        gamestate.performMove(legalMove)
                         newGameState = True
                                                 
                         selectedSquare = ()
@@ -96,22 +197,46 @@ def main():
             # key presses
             if event.type == p.KEYDOWN:
                 
+                dirtyBoard = True
+                
                 # u is the hotkey for undo
                 if event.key == p.K_u:
                     
+                    worker.cancel()
+                    engineThinking = False
+                    promotionChoices = []
                     gamestate.undoMove()
+                    
+                    # against the engine the player gets back to their own move
+                    while gamestate.moveLog and gamestate.turnPlayer in enginePlayers and \
+                          len(enginePlayers) < len(gamestate.players):
+                        gamestate.undoMove()
+                    
                     newGameState = True
                     gameover = False
                     
                 # r is the hotkey for resetting the board
                 if event.key == p.K_r:
                     
+                    worker.cancel()
+                    engineThinking = False
                     gamestate = engine.GameState()
                     legalMoves = gamestate.generateLegalMoves()
                     newGameState = False
+                    promotionChoices = []
                     gameover = False
                     selectedSquare = ()
                     moveCoordinates = []
+                
+                # e lets the engine move for the turn player, or stops it
+                if event.key == p.K_e:
+                    
+                    worker.cancel()
+                    engineThinking = False
+                    enginePlayers ^= {gamestate.turnPlayer}
+                    selectedSquare = ()
+                    moveCoordinates = []
+                    promotionChoices = []
         
         # generate new legal moves if the gamestate changed
         if newGameState == True:
@@ -119,26 +244,80 @@ def main():
             legalMoves = gamestate.generateLegalMoves()
             newGameState = False
         
-        graphics.drawGameState(window, gamestate, legalMoves, selectedSquare, 
-                               images, font, totalWidth, totalHeight,
-                               HEIGHT, SQUARE_SIZE, BORDERS, DIM)
+        # the engine starts thinking once it's its turn, the window keeps
+        # running meanwhile
+        if gamestate.turnPlayer in enginePlayers and not engineThinking and \
+           not (gamestate.checkmate or gamestate.isDraw()):
+            
+            worker.start(gamestate.startFEN, [move.moveID for move in gamestate.moveLog])
+            engineThinking = True
+        
+        # the move log only changes with the moves
+        if moveLogView.update(gamestate.moveLog):
+            dirtyLog = True
+        
+        if not (repaint or dirtyBoard or dirtyLog):
+            continue
         
-        # end of game screen
-        if gamestate.checkmate:
+        updatedRects = []
+        
+        if repaint:
+            
+            graphics.drawGameState(window, gamestate, legalMoves, selectedSquare, 
+                                   renderCache, moveLogView, SQUARE_SIZE, BORDERS, DIM)
             
-            gameover = True
-            winner = [player for player in gamestate.players if player != gamestate.turnPlayer][0]
-            graphics.drawGameoverText(window, winner + "wins", images, WIDTH, BORDERS)
+        else:
             
-        elif gamestate.stalemate:
+            if dirtyBoard:
+                updatedRects.append(graphics.drawBoard(window, gamestate, legalMoves, selectedSquare, 
+                                                       renderCache, SQUARE_SIZE, BORDERS, DIM))
             
-            gameover = True
-            graphics.drawGameoverText(window, "stalemate", images, WIDTH, BORDERS)
+            if dirtyLog:
+                updatedRects.append(graphics.drawMoveLog(window, gamestate, moveLogView))
+        
+        # overlays on the board
+        if repaint or dirtyBoard:
+            
+            if promotionChoices:
+                graphics.drawPromotionPicker(window, promotionChoices, renderCache, SQUARE_SIZE, BORDERS)
+            
+            # end of game screen
+            if gamestate.checkmate:
+                
+                gameover = True
+                winner = [player for player in gamestate.players if player != gamestate.turnPlayer][0]
+                graphics.drawGameoverText(window, winner + "wins", renderCache, WIDTH, BORDERS)
+                
+            elif gamestate.stalemate:
+                
+                gameover = True
+                graphics.drawGameoverText(window, "stalemate", renderCache, WIDTH, BORDERS)
+            
+            elif gamestate.isDraw():
+                
+                gameover = True
+                
+                if gamestate.repetition:
+                    reason = "threefold repetition"
+                elif gamestate.fiftyMoves:
+                    reason = "fifty move rule"
+                else:
+                    reason = "insufficient material"
+                
+                graphics.drawDrawText(window, reason, drawFont, WIDTH, BORDERS)
+        
+        # only the parts that were drawn are sent to the display
+        if repaint:
+            p.display.flip()
+        else:
+            p.display.update(updatedRects)
         
-        clock.tick(FPS)
-        p.display.flip()
+        repaint = False
+        dirtyBoard = False
+        dirtyLog = False
     
     # close the window
+    worker.cancel()
     p.quit()
     
     
@@ -150,7 +329,8 @@ if __name__ == "__main__":
     BORDERS around the board for extra features.
     DIM = Dimensions of the board is always 8.
     Each row and column has 8 squares of size SQUARE_SIZE.
-    FPS the game runs at, possibly allow the user to change this later.
+    ENGINE_EVENT the engine's results are posted as.
+    ENGINE_TIME the engine thinks about a move, in seconds.
     """
     
     WIDTH = 512
@@ -158,6 +338,7 @@ if __name__ == "__main__":
     BORDERS = {"l": 25, "r": 350, "t": 25, "b": 25}
     DIM = 8
     SQUARE_SIZE = int(WIDTH / DIM)
-    FPS = 30
+    ENGINE_EVENT = p.USEREVENT + 1
+    ENGINE_TIME = 2.0
     
     main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+
+import engine
+import perft
+import search
+import transposition
+
+
+# perft and fixed-depth analysis of a game state are split over a process
+# pool with one task per root move, every task is independent of the others
+# so the merged results are the same as running them in a single process
+
+
+def serializePosition(gamestate):
+
+    """
+    Compact form of a game state that can be sent to worker processes:
+    whether it uses a BitBoard, the FEN the game started from and the
+    moveIDs of the moves played since, so the workers know the earlier
+    positions for repetitions.
+    """
+
+    return (isinstance(gamestate.board, engine.BitBoard), gamestate.startFEN,
+            [move.moveID for move in gamestate.moveLog])
+
+
+def deserializePosition(position):
+
+    """
+    Rebuilds a game state from its serialized form by replaying the moves.
+    """
+
+    bitboard, fen, moveIDs = position
+
+    gamestate = engine.GameState.fromFEN(fen, engine.BitBoard if bitboard else engine.Board)
+
+    for moveID in moveIDs:
+        gamestate.performMove(gamestate.legalMoveFromID(moveID))
+
+    return gamestate
+
+
+def perftTask(task):
+
+    """
+    Worker function, counts the leaf nodes below one root move.
+    """
+
+    position, moveID, depth, hashMB = task
+
+    gamestate = deserializePosition(position)
+    gamestate.performMove(gamestate.legalMoveFromID(moveID))
+
+    table = transposition.TranspositionTable(hashMB) if hashMB else None
+
+    return perft.perft(gamestate, depth - 1, table)
+
+
+def analysisTask(task):
+
+    """
+    Worker function, searches one root move to a fixed depth with a full
+    window and a fresh transposition table. Returns the score from the
+    point of view of the player making the root move, the moveIDs of the
+    principal variation starting with the root move, and the node count.
+    """
+
+    position, moveID, depth, hashMB = task
+
+    gamestate = deserializePosition(position)
+    gamestate.performMove(gamestate.legalMoveFromID(moveID))
+
+    searcher = search.Search(transposition.TranspositionTable(hashMB))
+    score, pv = searcher.negamax(gamestate, depth - 1, 1, -search.INFINITY, search.INFINITY)
+
+    return -score, [moveID] + [move.moveID for move in pv], searcher.nodes
+
+
+def runTasks(function, tasks, processes):
+
+    """
+    Runs the tasks in a process pool, or in this process if only one
+    process is asked for. The results are in the order of the tasks.
+    """
+
+    if processes == 1:
+        return [function(task) for task in tasks]
+
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(function, tasks, chunksize = 1)
+
+
+def parallelDivide(gamestate, depth, processes = None, hashMB = 0):
+
+    """
+    Perft divide with the root moves split across processes. Returns a
+    list of tuples of the move in coordinate notation and the number of
+    leaf nodes below it, in the order of generateLegalMoves.
+    """
+
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+
+    moves = gamestate.generateLegalMoves()
+
+    if depth <= 1:
+        return [(move.coordinateNotation(), 1) for move in moves]
+
+    position = serializePosition(gamestate)
+    tasks = [(position, move.moveID, depth, hashMB) for move in moves]
+
+    counts = runTasks(perftTask, tasks, processes)
+
+    return [(move.coordinateNotation(), n) for move, n in zip(moves, counts)]
+
+
+def parallelPerft(gamestate, depth, processes = None, hashMB = 0):
+
+    """
+    Perft with the root moves split across processes.
+    """
+
+    if depth == 0:
+        return 1
+
+    return sum(n for _, n in parallelDivide(gamestate, depth, processes, hashMB))
+
+
+def analyseRootMoves(gamestate, depth, processes = None, hashMB = 16):
+
+    """
+    Scores every root move of a game state with a fixed-depth search, split
+    across processes. Returns a list of tuples of score, principal
+    variation in coordinate notation and node count, best move first. Ties
+    keep the order of generateLegalMoves.
+    """
+
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+
+    moves = gamestate.generateLegalMoves()
+    position = serializePosition(gamestate)
+    tasks = [(position, move.moveID, depth, hashMB) for move in moves]
+
+    results = []
+
+    for score, pv, nodes in runTasks(analysisTask, tasks, processes):
+
+        # replay the principal variation to get readable moves
+        notation = []
+
+        for moveID in pv:
+
+            move = gamestate.legalMoveFromID(moveID)
+            notation.append(move.coordinateNotation())
+            gamestate.performMove(move)
+
+        for _ in pv:
+            gamestate.undoMove()
+
+        results.append((score, notation, nodes))
+
+    # generating moves while replaying changed these
+    gamestate.generateLegalMoves()
+
+    results.sort(key = lambda result: -result[0])
+
+    return results
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import time
+
+import engine
+import parallel
+import transposition
+
+
+# standard test positions with their reference node counts per depth, taken
+# from https://www.chessprogramming.org/Perft_Results
+
+POSITIONS = {
+    "start": {"fen": engine.STARTING_FEN,
+              "nodes": [1, 20, 400, 8902, 197281, 4865609, 119060324]},
+    "kiwipete": {"fen": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 "nodes": [1, 48, 2039, 97862, 4085603]},
+    "position3": {"fen": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                  "nodes": [1, 14, 191, 2812, 43238, 674624]},
+    "position4": {"fen": "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                  "nodes": [1, 6, 264, 9467, 422333]},
+    "position5": {"fen": "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  "nodes": [1, 44, 1486, 62379, 2103487]},
+    }
+
+
+def perftKey(gamestate, depth):
+
+    """
+    Key of a position for storing perft results in a transposition table.
+    Node counts are only valid for one depth, so it's mixed into the key.
+    """
+
+    return gamestate.zobristKey ^ ((depth * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+
+
+def perft(gamestate, depth, table = None):
+
+    """
+    Counts the number of leaf nodes of the move generation tree of a game
+    state up to a given depth. Moves are performed and undone on the game
+    state itself, it is left unchanged once the count is done. Subtree
+    counts are reused through the transposition table if one is given.
+    """
+
+    if depth == 0:
+        return 1
+
+    if table != None and depth > 1:
+
+        entry = table.probe(perftKey(gamestate, depth))
+
+        if entry != None:
+            return entry[1]
+
+    moves = gamestate.generateLegalMoves()
+
+    # no need to perform the moves of the last ply
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+
+    for move in moves:
+
+        gamestate.performMove(move)
+        nodes += perft(gamestate, depth - 1, table)
+        gamestate.undoMove()
+
+    if table != None:
+        table.store(perftKey(gamestate, depth), depth, nodes)
+
+    return nodes
+
+
+def divide(gamestate, depth, table = None):
+
+    """
+    Perft split up by the moves of the turn player. Returns a list of tuples
+    containing the move in coordinate notation and the number of leaf nodes
+    below it, useful for finding the move that causes a wrong node count.
+    """
+
+    results = []
+
+    for move in gamestate.generateLegalMoves():
+
+        gamestate.performMove(move)
+        results.append((move.coordinateNotation(), perft(gamestate, depth - 1, table)))
+        gamestate.undoMove()
+
+    return results
+
+
+def playMoves(gamestate, moves):
+
+    """
+    Plays a list of moves in coordinate notation on a game state. Raises a
+    ValueError if one of the moves is not legal.
+    """
+
+    for notation in moves:
+
+        legalMoves = gamestate.generateLegalMoves()
+        matches = [m for m in legalMoves if m.coordinateNotation() == notation]
+
+        if not matches:
+            raise ValueError(f"Move {notation} is not legal in this position.")
+
+        gamestate.performMove(matches[0])
+
+    return gamestate
+
+
+def runPerft(gamestate, depth, showDivide = False, expected = None, table = None,
+             processes = 1, hashMB = 0):
+
+    """
+    Runs perft on a game state and prints the node count, the elapsed time
+    and the nodes per second. With more than one process the root moves are
+    split over a process pool, every worker gets its own transposition 
+    table of hashMB. Returns the number of nodes.
+    """
+
+    start = time.perf_counter()
+
+    if processes > 1:
+
+        results = parallel.parallelDivide(gamestate, depth, processes, hashMB)
+        nodes = sum(n for _, n in results)
+
+        if showDivide:
+
+            for notation, n in results:
+                print(f"{notation}: {n}")
+
+            print()
+
+    elif showDivide:
+
+        results = divide(gamestate, depth, table)
+        nodes = sum(n for _, n in results)
+
+        for notation, n in results:
+            print(f"{notation}: {n}")
+
+        print()
+
+    else:
+
+        nodes = perft(gamestate, depth, table)
+
+    elapsed = time.perf_counter() - start
+    nps = nodes / elapsed if elapsed > 0 else 0.0
+
+    line = f"depth {depth}  nodes {nodes}  time {elapsed:.3f}s  nps {nps:.0f}"
+
+    if expected is not None:
+        line += "  OK" if nodes == expected else f"  FAIL (expected {expected})"
+
+    print(line)
+
+    return nodes
+
+
+def main():
+
+    """
+    Command line interface for running perft on the test positions.
+    """
+
+    parser = argparse.ArgumentParser(description = "Perft for the chess engine.")
+    parser.add_argument("-d", "--depth", type = int, default = 3,
+                        help = "maximum depth to search")
+    parser.add_argument("-p", "--position", choices = list(POSITIONS) + ["all"],
+                        default = "start", help = "test position to run")
+    parser.add_argument("-f", "--fen", default = None,
+                        help = "position in FEN to run, overrides --position")
+    parser.add_argument("-m", "--moves", nargs = "*", default = [],
+                        help = "moves in coordinate notation played from the "
+                               "position before running")
+    parser.add_argument("--divide", action = "store_true",
+                        help = "show the node count of every root move")
+    parser.add_argument("--bitboard", action = "store_true",
+                        help = "use the bitboard implementation of the board")
+    parser.add_argument("--hash", type = float, default = 0, metavar = "MB",
+                        help = "size of the transposition table in MB, "
+                               "0 disables it")
+    parser.add_argument("-j", "--processes", type = int, default = 1,
+                        help = "number of processes the root moves are split over")
+    parser.add_argument("--stats", action = "store_true",
+                        help = "count calls and time of the engine's hot paths, "
+                               "only in this process")
+    args = parser.parse_args()
+
+    if args.stats:
+        engine.INSTRUMENTATION.enable()
+
+    if args.fen != None:
+        positions = {"custom": {"fen": args.fen, "nodes": []}}
+    elif args.position == "all":
+        positions = POSITIONS
+    else:
+        positions = {args.position: POSITIONS[args.position]}
+
+    boardType = engine.BitBoard if args.bitboard else engine.Board
+
+    failed = False
+
+    for name, position in positions.items():
+
+        print(f"position {name}")
+
+        gamestate = engine.GameState.fromFEN(position["fen"], boardType)
+        reference = position["nodes"]
+
+        # reference counts don't apply once moves are played
+        if args.moves:
+            gamestate = playMoves(gamestate, args.moves)
+            reference = []
+
+        # every position starts with an empty table for comparable timings,
+        # worker processes make their own
+        table = None
+
+        if args.hash and args.processes == 1:
+            table = transposition.TranspositionTable(args.hash)
+
+        for depth in range(1, args.depth + 1):
+
+            expected = None
+
+            if depth < len(reference):
+                expected = reference[depth]
+
+            # the breakdown is only shown for the deepest search
+            showDivide = args.divide and depth == args.depth
+            nodes = runPerft(gamestate, depth, showDivide, expected, table,
+                             args.processes, args.hash)
+
+            failed = failed or (expected is not None and nodes != expected)
+
+        if table != None:
+
+            statistics = table.statistics()
+            print(f"hash {statistics['sizeMB']:.1f}MB  hits {statistics['hits']}  "
+                  f"misses {statistics['misses']}  stores {statistics['stores']}  "
+                  f"overwrites {statistics['overwrites']}")
+
+        print()
+
+    if args.stats:
+        engine.INSTRUMENTATION.disable()
+        engine.INSTRUMENTATION.report()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+
+    raise SystemExit(main())
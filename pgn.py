@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import multiprocessing
+import re
+import time
+
+import engine
+
+
+# games are read one at a time from the file, so a collection of any size
+# can be checked with constant memory. Every game is replayed on its own
+# game state, that's what the worker processes are used for
+
+SAN_PATTERN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$")
+TAG_PATTERN = re.compile(r'^\[\s*(\w+)\s+"(.*)"\s*\]\s*$')
+
+# everything in the movetext that isn't a move
+COMMENT_PATTERN = re.compile(r"\{[^}]*\}|;[^\n]*")
+NAG_PATTERN = re.compile(r"\$\d+")
+MOVE_NUMBER_PATTERN = re.compile(r"\d+\.(\.\.)?")
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+PIECE_LETTERS = {"N": "Knight", "B": "Bishop", "R": "Rook", "Q": "Queen", "K": "King"}
+
+
+class PGNError(Exception):
+
+    """
+    Raised when a move of a game can't be parsed or isn't legal.
+    """
+
+
+class PGNGame():
+
+    """
+    A game as it was read from a PGN file: its number in the file counted
+    from 1, the line it starts on, the tag pairs and the movetext, which
+    isn't parsed yet. The lines of the movetext are kept apart since a ;
+    comment ends with its line.
+    """
+
+    def __init__(self, number, line, tags, movetext):
+
+        self.number = number
+        self.line = line
+        self.tags = tags
+        self.movetext = movetext
+
+
+    def __str__(self):
+
+        return f"game {self.number} (line {self.line})"
+
+
+def readGames(lines):
+
+    """
+    Generator over the games of a PGN file, given as an iterable of lines
+    like an open file. Only the game being read is kept in memory.
+    """
+
+    number = 1
+    start = None
+    tags = {}
+    movetext = []
+
+    # comments can span several lines and contain anything
+    commentDepth = 0
+
+    for lineNumber, line in enumerate(lines, 1):
+
+        line = line.strip()
+
+        if commentDepth == 0:
+
+            # escaped lines are ignored
+            if line.startswith("%"):
+                continue
+
+            if line.startswith("["):
+
+                # a tag after movetext starts the next game
+                if movetext:
+
+                    yield PGNGame(number, start, tags, "\n".join(movetext))
+
+                    number += 1
+                    start = None
+                    tags = {}
+                    movetext = []
+
+                match = TAG_PATTERN.match(line)
+
+                if match:
+                    tags[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+
+                if start == None:
+                    start = lineNumber
+
+                continue
+
+        if not line:
+            continue
+
+        if start == None:
+            start = lineNumber
+
+        movetext.append(line)
+        commentDepth = commentDepthAfter(line, commentDepth)
+
+    if movetext or tags:
+        yield PGNGame(number, start, tags, "\n".join(movetext))
+
+    return
+
+
+def commentDepthAfter(line, commentDepth):
+
+    """
+    Returns the comment depth at the end of a line of movetext given the
+    depth at its start. Braces after a ; are part of that comment and
+    don't count.
+    """
+
+    for char in line:
+
+        if char == "{":
+            commentDepth += 1
+        elif char == "}":
+            commentDepth = max(0, commentDepth - 1)
+        elif char == ";" and commentDepth == 0:
+            break
+
+    return commentDepth
+
+
+def tokenize(movetext):
+
+    """
+    Splits movetext into the moves in SAN and the result. Comments,
+    variations, move numbers and annotations are dropped.
+    """
+
+    movetext = COMMENT_PATTERN.sub(" ", movetext)
+
+    # variations can be nested
+    text = []
+    depth = 0
+
+    for char in movetext:
+
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            text.append(char)
+
+    movetext = NAG_PATTERN.sub(" ", "".join(text))
+
+    moves = []
+    result = None
+
+    for token in movetext.split():
+
+        if token in RESULTS:
+            result = token
+            continue
+
+        token = MOVE_NUMBER_PATTERN.sub("", token, count = 1) if token[0].isdigit() else token
+
+        if token and token != "e.p.":
+            moves.append(token)
+
+    return moves, result
+
+
+def parseSAN(gamestate, san, legalMoves = None):
+
+    """
+    Returns the legal move of the game state written as san in standard
+    algebraic notation, e.g. Nf3, exd5, O-O or e8=Q+. Raises a PGNError if
+    it can't be parsed, is ambiguous or isn't legal.
+    """
+
+    if legalMoves == None:
+        legalMoves = gamestate.generateLegalMoves()
+
+    notation = san.rstrip("+#!?")
+
+    # castling is written with letters or zeros
+    if notation in ("O-O", "0-0", "O-O-O", "0-0-0"):
+
+        side = notation.replace("O", "0")
+
+        for move in legalMoves:
+
+            if move.isCastle and move.side == side:
+                return move
+
+        raise PGNError(f"illegal move {san}")
+
+    match = SAN_PATTERN.match(notation)
+
+    if not match:
+        raise PGNError(f"can't parse move {san}")
+
+    piece, fromCol, fromRow, _, destination, promotion = match.groups()
+
+    pieceType = PIECE_LETTERS[piece] if piece else "Pawn"
+    destinationCol = ord(destination[0]) - ord("a")
+    destinationRow = 8 - int(destination[1])
+
+    candidates = []
+
+    for move in legalMoves:
+
+        if move.movedPiece.pieceType != pieceType or move.isCastle:
+            continue
+
+        if (move.destinationRow, move.destinationCol) != (destinationRow, destinationCol):
+            continue
+
+        if fromCol and move.startCol != ord(fromCol) - ord("a"):
+            continue
+
+        if fromRow and move.startRow != 8 - int(fromRow):
+            continue
+
+        if move.promotionPiece != promotion:
+
+            # some files leave out the piece, it's a queen then
+            if not (move.promotionPiece == "Q" and promotion == None):
+                continue
+
+        candidates.append(move)
+
+    if not candidates:
+        raise PGNError(f"illegal move {san}")
+
+    if len(candidates) > 1:
+        raise PGNError(f"ambiguous move {san}")
+
+    return candidates[0]
+
+
+def startingPosition(game, boardType = None):
+
+    """
+    Returns a new game state with the position a PGNGame starts from, the
+    FEN tag if there is one. Raises a PGNError if the tag isn't valid.
+    """
+
+    try:
+        return engine.GameState(boardType, game.tags.get("FEN"))
+    except ValueError as error:
+        raise PGNError(f"invalid FEN tag: {error}")
+
+
+def replayGame(game, boardType = None):
+
+    """
+    Replays a PGNGame on a new game state, starting from the FEN tag if
+    there is one. Returns the game state after the last move. Raises a
+    PGNError naming the move that failed.
+    """
+
+    gamestate = startingPosition(game, boardType)
+    moves, _ = tokenize(game.movetext)
+
+    for san in moves:
+
+        try:
+            move = parseSAN(gamestate, san)
+        except PGNError as error:
+            dots = "." if gamestate.turnPlayer == "white" else "..."
+            raise PGNError(f"move {gamestate.fullmoveNumber}{dots} {error}")
+
+        gamestate.performMove(move)
+
+    return gamestate
+
+
+def validateGame(game):
+
+    """
+    Worker function, replays a game and returns its number, line, the
+    number of plies replayed and the error message, None if the whole game
+    was legal.
+    """
+
+    try:
+
+        gamestate = replayGame(game)
+
+        return game.number, game.line, len(gamestate.moveLog), None
+
+    except PGNError as error:
+
+        return game.number, game.line, 0, str(error)
+
+
+def batches(games, size):
+
+    """
+    Groups the games into lists of a given size, so the process pool never
+    holds more than one batch of a file.
+    """
+
+    batch = []
+
+    for game in games:
+
+        batch.append(game)
+
+        if len(batch) == size:
+
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+    return
+
+
+def validatePGN(lines, processes = None, batchSize = 1000, report = None):
+
+    """
+    Replays every game of a PGN file given as an iterable of lines. report
+    is called with the result tuple of validateGame for every invalid
+    game. Returns a dictionary with the number of games, invalid games and
+    plies, the elapsed time and games and plies per second.
+    """
+
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+
+    games = 0
+    invalid = 0
+    plies = 0
+
+    start = time.perf_counter()
+
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+
+    try:
+
+        for batch in batches(readGames(lines), batchSize):
+
+            if pool != None:
+                results = pool.imap(validateGame, batch, chunksize = 16)
+            else:
+                results = map(validateGame, batch)
+
+            for result in results:
+
+                games += 1
+                plies += result[2]
+
+                if result[3] != None:
+
+                    invalid += 1
+
+                    if report != None:
+                        report(result)
+
+    finally:
+
+        if pool != None:
+
+            pool.close()
+            pool.join()
+
+    elapsed = time.perf_counter() - start
+
+    return {"games": games, "invalid": invalid, "plies": plies, "time": elapsed,
+            "gamesPerSecond": games / elapsed if elapsed > 0 else 0.0,
+            "pliesPerSecond": plies / elapsed if elapsed > 0 else 0.0}
+
+
+def main():
+
+    """
+    Command line interface for checking PGN files.
+    """
+
+    parser = argparse.ArgumentParser(description = "Replay and validate the games of PGN files.")
+    parser.add_argument("files", nargs = "+",
+                        help = "PGN files to read")
+    parser.add_argument("-j", "--processes", type = int, default = None,
+                        help = "number of processes the games are spread over, "
+                               "defaults to the number of CPUs")
+    parser.add_argument("--batch", type = int, default = 1000,
+                        help = "number of games handed to the processes at once")
+    args = parser.parse_args()
+
+    def report(result):
+
+        number, line, _, error = result
+        print(f"game {number} (line {line}): {error}")
+
+    failed = False
+
+    for path in args.files:
+
+        # collections come in all kinds of encodings, only tags and
+        # comments can contain anything else than ascii
+        with open(path, encoding = "utf-8", errors = "replace") as file:
+            statistics = validatePGN(file, args.processes, args.batch, report)
+
+        print(f"{path}  games {statistics['games']}  invalid {statistics['invalid']}  "
+              f"plies {statistics['plies']}  time {statistics['time']:.3f}s  "
+              f"games/s {statistics['gamesPerSecond']:.1f}  "
+              f"plies/s {statistics['pliesPerSecond']:.0f}")
+
+        failed = failed or statistics["invalid"] > 0
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+
+    raise SystemExit(main())
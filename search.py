@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import contextlib
+import time
+
+import book
+import engine
+import evaluation
+import parallel
+import perft
+import tablebase
+import transposition
+
+
+# scores are in centipawns, mates are scored relative to MATE_SCORE so that
+# shorter mates are preferred
+MATE_SCORE = 100000
+INFINITY = 1000000
+
+# how often the time limit is checked, in nodes
+CHECK_INTERVAL = 1024
+
+
+class SearchStopped(Exception):
+
+    """
+    Raised inside the search when one of the limits is reached.
+    """
+
+
+def scoreToTable(score, ply):
+
+    """
+    Mate scores are stored relative to the position instead of the root,
+    the same position can be reached at different plies.
+    """
+
+    if score >= MATE_SCORE - 1000:
+        return score + ply
+    elif score <= -MATE_SCORE + 1000:
+        return score - ply
+
+    return score
+
+
+def scoreFromTable(score, ply):
+
+    """
+    Converts a score from the transposition table back to the current ply.
+    """
+
+    if score >= MATE_SCORE - 1000:
+        return score - ply
+    elif score <= -MATE_SCORE + 1000:
+        return score + ply
+
+    return score
+
+
+class SearchResult():
+
+    """
+    Result of one iteration of the search: the best move with its score,
+    the principal variation and how much work it took.
+    """
+
+    def __init__(self, depth, score, pv, nodes, elapsed):
+
+        self.depth = depth
+        self.score = score
+        self.pv = pv
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+        self.bestMove = pv[0] if pv else None
+
+
+    def __str__(self):
+
+        nps = self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+        if abs(self.score) >= MATE_SCORE - 1000:
+            plies = MATE_SCORE - abs(self.score)
+            score = f"mate {(plies + 1) // 2 if self.score > 0 else -((plies + 1) // 2)}"
+        else:
+            score = f"cp {self.score}"
+
+        return f"depth {self.depth}  score {score}  nodes {self.nodes}  " \
+               f"time {self.elapsed:.3f}s  nps {nps:.0f}  " \
+               f"pv {' '.join(m.coordinateNotation() for m in self.pv)}"
+
+
+class Search():
+
+    """
+    Negamax search with alpha-beta pruning and iterative deepening. Moves
+    are performed and undone on the game state that is searched, it's
+    never copied. A transposition table is used for move ordering and for
+    cutting off positions that were already searched deep enough. With
+    tablebases, positions they cover are scored from them without being
+    searched.
+    """
+
+    def __init__(self, table = None, tablebases = None):
+
+        if table == None:
+            table = transposition.TranspositionTable()
+
+        self.table = table
+        self.tablebases = tablebases
+        self.nodes = 0
+        self.stopped = False
+
+        self.deadline = None
+        self.nodeLimit = None
+
+
+    def stop(self):
+
+        """
+        Makes a running search return as soon as possible, with the result of
+        the last completed iteration. Can be called from another thread.
+        """
+
+        self.stopped = True
+
+
+    def search(self, gamestate, maxDepth = 64, timeLimit = None, nodeLimit = None,
+               info = None):
+
+        """
+        Searches a game state with increasing depth until one of the limits
+        is reached. The time limit is in seconds. info is called with the
+        SearchResult of every completed iteration. Returns the result of the
+        deepest completed iteration, or None if not even the first one
+        finished.
+        """
+
+        start = time.perf_counter()
+
+        self.nodes = 0
+        self.stopped = False
+        self.deadline = start + timeLimit if timeLimit != None else None
+        self.nodeLimit = nodeLimit
+
+        # the search changes these while it walks through the tree
+        rootLength = len(gamestate.moveLog)
+        checkmate = gamestate.checkmate
+        stalemate = gamestate.stalemate
+        inCheck = {p: gamestate.kings[p].inCheck for p in gamestate.players}
+
+        result = None
+
+        try:
+
+            for depth in range(1, maxDepth + 1):
+
+                score, pv = self.negamax(gamestate, depth, 0, -INFINITY, INFINITY)
+                result = SearchResult(depth, score, pv, self.nodes,
+                                      time.perf_counter() - start)
+
+                if info != None:
+                    info(result)
+
+                # no point in searching deeper once there's nothing to choose
+                # from or a forced mate was found
+                if not pv or abs(score) >= MATE_SCORE - depth:
+                    break
+
+        except SearchStopped:
+
+            while len(gamestate.moveLog) > rootLength:
+                gamestate.undoMove()
+
+        gamestate.checkmate = checkmate
+        gamestate.stalemate = stalemate
+
+        for p in gamestate.players:
+            gamestate.kings[p].inCheck = inCheck[p]
+
+        return result
+
+
+    def checkLimits(self):
+
+        """
+        Raises SearchStopped if the search was stopped or ran out of time or
+        nodes.
+        """
+
+        if self.stopped:
+            raise SearchStopped()
+
+        if self.nodeLimit != None and self.nodes >= self.nodeLimit:
+            raise SearchStopped()
+
+        if self.deadline != None and time.perf_counter() >= self.deadline:
+            raise SearchStopped()
+
+
+    def orderMoves(self, moves):
+
+        """
+        Sorts captures so the ones most likely to cause a cutoff come first:
+        most valuable victim first, least valuable attacker second.
+        """
+
+        values = evaluation.PIECE_VALUES
+
+        def priority(move):
+
+            if move.capturedPiece != None:
+                return -10 * values[move.capturedPiece.pieceType] + values[move.movedPiece.pieceType] // 100
+
+            return 0
+
+        moves.sort(key = priority)
+
+        return moves
+
+
+    def negamax(self, gamestate, depth, ply, alpha, beta):
+
+        """
+        Returns the score of a game state from the point of view of the turn
+        player together with its principal variation.
+        """
+
+        self.nodes += 1
+
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.checkLimits()
+
+        # draws by rule, a position that occurred before is scored as a draw
+        # since the same moves could repeat it again
+        if ply > 0 and (gamestate.halfmoveClock >= 100 or gamestate.isRepetition(2) or
+                        gamestate.hasInsufficientMaterial()):
+            return 0, []
+
+        # the root is still searched so there is a move to play
+        if ply > 0 and self.tablebases != None and \
+           sum(len(pieces) for pieces in gamestate.activePieces.values()) <= self.tablebases.maxPieces:
+
+            entry = self.tablebases.probe(gamestate)
+
+            if entry != None:
+
+                result, plies = entry
+
+                if result == "win":
+                    return MATE_SCORE - ply - plies, []
+
+                if result == "loss":
+                    return -MATE_SCORE + ply + plies, []
+
+                return 0, []
+
+        if depth <= 0:
+            return self.quiescence(gamestate, alpha, beta), []
+
+        originalAlpha = alpha
+        hashMove = 0
+
+        entry = self.table.probe(gamestate.zobristKey)
+
+        if entry != None:
+
+            entryDepth, score, bound, hashMove = entry
+            score = scoreFromTable(score, ply)
+
+            # the root always searches so it has a move to return
+            if ply > 0 and entryDepth >= depth:
+
+                if bound == transposition.EXACT:
+                    return score, []
+                elif bound == transposition.LOWER_BOUND:
+                    alpha = max(alpha, score)
+                elif bound == transposition.UPPER_BOUND:
+                    beta = min(beta, score)
+
+                if alpha >= beta:
+                    return score, []
+
+        bestScore = -INFINITY
+        bestPv = []
+        legalMoves = 0
+
+        # the staged generator yields the hash move and the captures first,
+        # quiet moves are only generated if there's no cutoff before them
+        for move in gamestate.generateStagedMoves(hashMove):
+
+            legalMoves += 1
+
+            gamestate.performMove(move)
+            score, pv = self.negamax(gamestate, depth - 1, ply + 1, -beta, -alpha)
+            score = -score
+            gamestate.undoMove()
+
+            if score > bestScore:
+
+                bestScore = score
+                bestPv = [move] + pv
+
+            if score > alpha:
+                alpha = score
+
+            if alpha >= beta:
+                break
+
+        if legalMoves == 0:
+
+            if gamestate.kings[gamestate.turnPlayer].inCheck:
+                return -MATE_SCORE + ply, []
+
+            return 0, []
+
+        if bestScore <= originalAlpha:
+            bound = transposition.UPPER_BOUND
+        elif bestScore >= beta:
+            bound = transposition.LOWER_BOUND
+        else:
+            bound = transposition.EXACT
+
+        self.table.store(gamestate.zobristKey, depth, scoreToTable(bestScore, ply), bound,
+                         bestPv[0].moveID)
+
+        return bestScore, bestPv
+
+
+    def quiescence(self, gamestate, alpha, beta):
+
+        """
+        Searches captures and promotions only until the position is quiet, 
+        so the static evaluation isn't taken in the middle of an exchange.
+        """
+
+        self.nodes += 1
+
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.checkLimits()
+
+        standPat = evaluation.evaluate(gamestate)
+
+        if standPat >= beta:
+            return standPat
+
+        alpha = max(alpha, standPat)
+
+        captures = self.orderMoves(gamestate.generateMoves(engine.CAPTURES))
+
+        for move in captures:
+
+            gamestate.performMove(move)
+            score = -self.quiescence(gamestate, -beta, -alpha)
+            gamestate.undoMove()
+
+            if score >= beta:
+                return score
+
+            alpha = max(alpha, score)
+
+        return alpha
+
+
+def main():
+
+    """
+    Command line interface for searching a position.
+    """
+
+    parser = argparse.ArgumentParser(description = "Search a position with the chess engine.")
+    parser.add_argument("-d", "--depth", type = int, default = 64,
+                        help = "maximum depth to search")
+    parser.add_argument("-t", "--time", type = float, default = None,
+                        help = "time limit in seconds")
+    parser.add_argument("-n", "--nodes", type = int, default = None,
+                        help = "node limit")
+    parser.add_argument("-f", "--fen", default = engine.STARTING_FEN,
+                        help = "position in FEN to search")
+    parser.add_argument("-m", "--moves", nargs = "*", default = [],
+                        help = "moves in coordinate notation played from the "
+                               "position before searching")
+    parser.add_argument("--hash", type = float, default = 16, metavar = "MB",
+                        help = "size of the transposition table in MB")
+    parser.add_argument("--book", default = None,
+                        help = "opening book, a book move is played without searching")
+    parser.add_argument("--tablebases", default = None, metavar = "DIRECTORY",
+                        help = "directory with endgame tablebases used during the search")
+    parser.add_argument("--analyse", action = "store_true",
+                        help = "score every root move with a fixed-depth search")
+    parser.add_argument("-j", "--processes", type = int, default = 1,
+                        help = "number of processes the root moves are split "
+                               "over when analysing")
+    parser.add_argument("--stats", action = "store_true",
+                        help = "count calls and time of the engine's hot paths")
+    args = parser.parse_args()
+
+    # without any limit the search would run forever
+    if args.depth == 64 and args.time == None and args.nodes == None:
+        args.depth = 4
+
+    gamestate = perft.playMoves(engine.GameState.fromFEN(args.fen), args.moves)
+
+    if args.book != None and not args.analyse:
+
+        with book.OpeningBook(args.book) as openingBook:
+            move = openingBook.pickMove(gamestate)
+
+        if move != None:
+
+            print(f"bookmove {move.coordinateNotation()}")
+            return 0
+
+    if args.analyse:
+
+        start = time.perf_counter()
+        results = parallel.analyseRootMoves(gamestate, args.depth, args.processes, args.hash)
+        elapsed = time.perf_counter() - start
+        nodes = sum(n for _, _, n in results)
+
+        for score, pv, _ in results:
+            print(f"{pv[0]}: {score}  pv {' '.join(pv)}")
+
+        print(f"depth {args.depth}  nodes {nodes}  time {elapsed:.3f}s  "
+              f"nps {nodes / elapsed if elapsed > 0 else 0.0:.0f}")
+
+        return 0
+
+    tablebases = tablebase.Tablebases(args.tablebases) if args.tablebases != None else None
+
+    searcher = Search(transposition.TranspositionTable(args.hash), tablebases)
+
+    with engine.INSTRUMENTATION if args.stats else contextlib.nullcontext():
+        result = searcher.search(gamestate, args.depth, args.time, args.nodes, info = print)
+
+    if tablebases != None:
+        tablebases.close()
+
+    if result is not None and result.bestMove is not None:
+        print(f"bestmove {result.bestMove.coordinateNotation()}")
+
+    if args.stats:
+        engine.INSTRUMENTATION.report()
+
+    return 0
+
+
+if __name__ == "__main__":
+
+    raise SystemExit(main())
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import collections
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+import book
+import engine
+import search
+import transposition
+
+
+# games are played without a window between two move pickers, each game is
+# an independent task so they can be spread over a process pool and the
+# results are written as soon as a game is finished
+
+PICKERS = ["random", "first", "engine"]
+
+
+class Player():
+
+    """
+    Picks the moves for one side of a self-play game. random picks any
+    legal move, first always picks the first generated move and engine
+    searches the position with a depth and node limit. With an opening
+    book, book moves are played as long as there are any.
+    """
+
+    def __init__(self, picker, rng, depth = 2, nodes = None, hashMB = 1, openingBook = None):
+
+        self.picker = picker
+        self.rng = rng
+        self.openingBook = openingBook
+        self.depth = depth
+        self.nodes = nodes
+        self.searcher = None
+
+        if picker == "engine":
+            self.searcher = search.Search(transposition.TranspositionTable(hashMB))
+
+
+    def pickMove(self, gamestate, moves):
+
+        """
+        Returns one of the legal moves of the game state.
+        """
+
+        if self.openingBook != None:
+
+            move = self.openingBook.pickMove(gamestate, self.rng)
+
+            if move != None:
+                return moves.find(move)
+
+        if self.picker == "first":
+            return moves[0]
+
+        if self.picker == "engine":
+
+            result = self.searcher.search(gamestate, self.depth, nodeLimit = self.nodes)
+
+            # the node limit can be hit before the first iteration finishes
+            if result != None and result.bestMove != None:
+                return moves.find(result.bestMove)
+
+        return self.rng.choice(moves)
+
+
+def playGame(task):
+
+    """
+    Worker function, plays one game and returns a dictionary with the game
+    number, the players, the moves in coordinate notation, the number of
+    plies, the result and why the game ended. Draws by rule end the game,
+    games that reach maxPlies are stopped with result "*". With verify
+    every move is undone again at the end and the start position has to
+    come back exactly.
+    """
+
+    number, fen, white, black, seed, maxPlies, depth, nodes, hashMB, verify, bookPath = task
+
+    rng = random.Random(seed)
+    gamestate = engine.GameState.fromFEN(fen)
+
+    # the book is memory-mapped, opening it for every game is cheap
+    openingBook = book.OpeningBook(bookPath) if bookPath != None else None
+
+    players = {"white": Player(white, rng, depth, nodes, hashMB, openingBook),
+               "black": Player(black, rng, depth, nodes, hashMB, openingBook)}
+
+    # compare with the FEN the game state writes, the given one may leave
+    # out the move counters or order its fields differently
+    startKey = gamestate.zobristKey
+    startFEN = gamestate.toFEN()
+    notation = []
+
+    result = "*"
+    termination = "max plies"
+
+    while len(notation) < maxPlies:
+
+        moves = gamestate.generateLegalMoves()
+
+        if gamestate.checkmate:
+
+            result = "0-1" if gamestate.turnPlayer == "white" else "1-0"
+            termination = "checkmate"
+            break
+
+        if gamestate.stalemate:
+
+            result = "1/2-1/2"
+            termination = "stalemate"
+            break
+
+        if gamestate.repetition or gamestate.fiftyMoves or gamestate.insufficientMaterial:
+
+            result = "1/2-1/2"
+
+            if gamestate.repetition:
+                termination = "threefold repetition"
+            elif gamestate.fiftyMoves:
+                termination = "fifty move rule"
+            else:
+                termination = "insufficient material"
+
+            break
+
+        move = players[gamestate.turnPlayer].pickMove(gamestate, moves)
+        notation.append(move.coordinateNotation())
+        gamestate.performMove(move)
+
+    if verify:
+
+        while gamestate.moveLog:
+            gamestate.undoMove()
+
+        if gamestate.zobristKey != startKey or gamestate.toFEN() != startFEN:
+            raise RuntimeError(f"Game {number} didn't undo back to its start position.")
+
+    if openingBook != None:
+        openingBook.close()
+
+    return {"game": number, "white": white, "black": black, "fen": fen,
+            "result": result, "termination": termination,
+            "plies": len(notation), "moves": notation}
+
+
+def runGames(tasks, processes):
+
+    """
+    Plays the games of the tasks in a process pool, or in this process if
+    only one process is asked for. Yields the results as games finish, not
+    in the order of the tasks.
+    """
+
+    if processes == 1:
+
+        for task in tasks:
+            yield playGame(task)
+
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+
+        for game in pool.imap_unordered(playGame, tasks, chunksize = 1):
+            yield game
+
+    return
+
+
+def selfPlay(games, output, white = "random", black = "random", fen = engine.STARTING_FEN,
+             processes = None, seed = 0, maxPlies = 400, depth = 2, nodes = None,
+             hashMB = 1, verify = False, progress = None, bookPath = None):
+
+    """
+    Plays a number of games and writes every finished game as one line of
+    JSON to the file object output. progress is called with the number of
+    finished games after each one. Returns a dictionary with the number of
+    games and plies, the elapsed time, games and plies per second and the
+    counts of results and terminations. bookPath is an opening book file
+    both players use.
+    """
+
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+
+    tasks = [(number, fen, white, black, seed + number, maxPlies, depth, nodes, hashMB, verify,
+              bookPath) for number in range(games)]
+
+    results = collections.Counter()
+    terminations = collections.Counter()
+    plies = 0
+    finished = 0
+
+    start = time.perf_counter()
+
+    for game in runGames(tasks, processes):
+
+        output.write(json.dumps(game) + "\n")
+        output.flush()
+
+        results[game["result"]] += 1
+        terminations[game["termination"]] += 1
+        plies += game["plies"]
+        finished += 1
+
+        if progress != None:
+            progress(finished)
+
+    elapsed = time.perf_counter() - start
+
+    return {"games": finished, "plies": plies, "time": elapsed,
+            "gamesPerSecond": finished / elapsed if elapsed > 0 else 0.0,
+            "pliesPerSecond": plies / elapsed if elapsed > 0 else 0.0,
+            "results": dict(results), "terminations": dict(terminations)}
+
+
+def main():
+
+    """
+    Command line interface for self-play.
+    """
+
+    parser = argparse.ArgumentParser(description = "Headless self-play for the chess engine.")
+    parser.add_argument("-g", "--games", type = int, default = 100,
+                        help = "number of games to play")
+    parser.add_argument("-o", "--output", default = "selfplay.jsonl",
+                        help = "file the games are written to as JSON lines, - for stdout")
+    parser.add_argument("-w", "--white", choices = PICKERS, default = "random",
+                        help = "move picker for white")
+    parser.add_argument("-b", "--black", choices = PICKERS, default = "random",
+                        help = "move picker for black")
+    parser.add_argument("-f", "--fen", default = engine.STARTING_FEN,
+                        help = "position in FEN every game starts from")
+    parser.add_argument("-j", "--processes", type = int, default = None,
+                        help = "number of processes the games are spread over, "
+                               "defaults to the number of CPUs")
+    parser.add_argument("-s", "--seed", type = int, default = 0,
+                        help = "seed of the first game, the others count up from it")
+    parser.add_argument("--max-plies", type = int, default = 400,
+                        help = "games are stopped unfinished after this many plies")
+    parser.add_argument("-d", "--depth", type = int, default = 2,
+                        help = "search depth of the engine picker")
+    parser.add_argument("-n", "--nodes", type = int, default = None,
+                        help = "node limit per move of the engine picker")
+    parser.add_argument("--hash", type = float, default = 1, metavar = "MB",
+                        help = "size of the engine picker's transposition table in MB")
+    parser.add_argument("--book", default = None,
+                        help = "opening book both players play from while it has moves")
+    parser.add_argument("--verify", action = "store_true",
+                        help = "undo every game back to its start position and "
+                               "check that it comes back exactly")
+    args = parser.parse_args()
+
+    def progress(finished):
+
+        if finished % 100 == 0 or finished == args.games:
+            print(f"\r{finished}/{args.games} games", end = "", file = sys.stderr, flush = True)
+
+    if args.output == "-":
+        output = sys.stdout
+    else:
+        output = open(args.output, "w")
+
+    try:
+
+        statistics = selfPlay(args.games, output, args.white, args.black, args.fen,
+                              args.processes, args.seed, args.max_plies, args.depth,
+                              args.nodes, args.hash, args.verify, progress, args.book)
+
+    finally:
+
+        if output is not sys.stdout:
+            output.close()
+
+    print(file = sys.stderr)
+
+    print(f"games {statistics['games']}  plies {statistics['plies']}  "
+          f"time {statistics['time']:.3f}s  games/s {statistics['gamesPerSecond']:.2f}  "
+          f"plies/s {statistics['pliesPerSecond']:.0f}", file = sys.stderr)
+
+    for result in ("1-0", "0-1", "1/2-1/2", "*"):
+
+        count = statistics["results"].get(result, 0)
+        share = 100 * count / statistics["games"] if statistics["games"] else 0.0
+        print(f"{result:8} {count:6}  {share:5.1f}%", file = sys.stderr)
+
+    for termination, count in sorted(statistics["terminations"].items()):
+        print(f"{termination}: {count}", file = sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+
+    raise SystemExit(main())
@@ -0,0 +1,993 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import sys
+import time
+
+import engine
+
+
+# endgame tablebases hold the exact result of every position of a set of
+# pieces, e.g. KQK or KRKP, with the distance to mate. They are generated by
+# retrograde analysis: checkmates are found first and the results are
+# propagated backwards one ply at a time by taking moves back.
+#
+# A table is a file with one byte per position, the position is the index:
+# the side to move and the square of every piece in the order of the
+# table's name, white pieces first, 6 bits per square. Positions with the
+# colors swapped are looked up mirrored. Castling and en passant are not
+# part of the positions.
+#
+# Values of the bytes, from the point of view of the side to move:
+#   0          draw
+#   1 - 127    win, mate in 2*value - 1 plies
+#   128 - 254  loss, mated in 2*(value - 128) plies
+#   255        position that can't occur
+
+DRAW = 0
+INVALID = 255
+MAX_PLIES = 253
+
+# pieces besides the kings in the order they appear in table names
+PIECE_ORDER = "QRBNP"
+PROMOTIONS = "QRBN"
+
+TYPE_LETTERS = {"King": "K", "Queen": "Q", "Rook": "R", "Bishop": "B", "Knight": "N", "Pawn": "P"}
+
+WHITE = 0
+BLACK = 1
+
+
+def encodeWin(plies):
+
+    return (plies + 1) // 2
+
+
+def encodeLoss(plies):
+
+    return 128 + plies // 2
+
+
+def decode(value):
+
+    """
+    Turns the value of a position into a tuple of the result for the side
+    to move ("win", "draw" or "loss") and the plies until mate, 0 for draws.
+    """
+
+    if value == DRAW:
+        return "draw", 0
+
+    if value < 128:
+        return "win", 2 * value - 1
+
+    if value < INVALID:
+        return "loss", 2 * (value - 128)
+
+    raise ValueError("The position can't occur.")
+
+
+def buildTables():
+
+    """
+    The square tables of the engine with plain square numbers instead of
+    (row, col) tuples, which is what the generator works with. Returns the
+    king and knight targets as sets, the pawn attacks per player as sets,
+    the rays per square and direction, the squares between two squares and
+    the direction from one square to another, None if they don't share a
+    line.
+    """
+
+    def squares(targets):
+        return [row*8 + col for row, col in targets]
+
+    kingTargets = [set(squares(targets)) for targets in engine.KING_TARGETS]
+    knightTargets = [set(squares(targets)) for targets in engine.KNIGHT_TARGETS]
+    pawnAttacks = [[set(squares(targets)) for targets in engine.PAWN_TARGETS[player]]
+                   for player in ("white", "black")]
+
+    rays = [{u: squares(ray) for u, ray in squareRays.items()} for squareRays in engine.RAYS]
+    between = [[squares(engine.BETWEEN[s1][s2]) for s2 in range(64)] for s1 in range(64)]
+
+    lines = [[None] * 64 for _ in range(64)]
+
+    for square in range(64):
+
+        for u, ray in rays[square].items():
+
+            for target in ray:
+                lines[square][target] = u
+
+    return kingTargets, knightTargets, pawnAttacks, rays, between, lines
+
+
+KING_TARGETS, KNIGHT_TARGETS, PAWN_ATTACKS, RAYS, BETWEEN, LINES = buildTables()
+
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+SLIDER_DIRECTIONS = {"Q": ROOK_DIRECTIONS + BISHOP_DIRECTIONS,
+                     "R": ROOK_DIRECTIONS,
+                     "B": BISHOP_DIRECTIONS}
+
+
+class Material():
+
+    """
+    A set of pieces a table is generated for, given by its name, e.g. KQK
+    or KBNK. The pieces are listed as (player, letter) in index order.
+    """
+
+    def __init__(self, name):
+
+        sides = name.upper().split("K")
+
+        if len(sides) != 3 or sides[0] != "" or \
+           any(letter not in PIECE_ORDER for letter in sides[1] + sides[2]):
+            raise ValueError(f"Invalid material {name}, e.g. KQK or KRKP.")
+
+        self.white = sortPieces(sides[1])
+        self.black = sortPieces(sides[2])
+        self.name = "K" + self.white + "K" + self.black
+
+        self.pieces = [(WHITE, "K")] + [(WHITE, letter) for letter in self.white] + \
+                      [(BLACK, "K")] + [(BLACK, letter) for letter in self.black]
+        self.count = len(self.pieces)
+        self.size = 2 * 64 ** self.count
+
+        # kings by player, they are needed for every check test
+        self.kings = [0, 1 + len(self.white)]
+
+
+    def __str__(self):
+
+        return self.name
+
+
+def sortPieces(letters):
+
+    return "".join(sorted(letters, key = PIECE_ORDER.index))
+
+
+def isTrivialDraw(white, black):
+
+    """
+    Checks if neither side can ever mate with the pieces besides the kings:
+    at most a single bishop or knight on the board.
+    """
+
+    pieces = white + black
+
+    return len(pieces) == 0 or (len(pieces) == 1 and pieces in "BN")
+
+
+def canonicalName(white, black):
+
+    """
+    Returns the name of the table for the pieces besides the kings of both
+    players and whether the colors have to be swapped to look them up.
+    Tables are generated with the stronger side as white.
+    """
+
+    white = sortPieces(white)
+    black = sortPieces(black)
+
+    def strength(letters):
+        return (len(letters), [-PIECE_ORDER.index(letter) for letter in letters])
+
+    if strength(black) > strength(white):
+        return "K" + black + "K" + white, True
+
+    return "K" + white + "K" + black, False
+
+
+def decodeIndex(index, count):
+
+    """
+    Splits an index into the side to move and the squares of the pieces.
+    """
+
+    squares = [0] * count
+
+    for i in range(count - 1, -1, -1):
+
+        squares[i] = index & 63
+        index >>= 6
+
+    return index, squares
+
+
+def encodeIndex(stm, squares):
+
+    index = stm
+
+    for square in squares:
+        index = index << 6 | square
+
+    return index
+
+
+def attacks(letter, player, start, target, occupied):
+
+    """
+    Checks if a piece on start attacks the target square. occupied is the
+    set of occupied squares.
+    """
+
+    if letter == "K":
+        return target in KING_TARGETS[start]
+
+    if letter == "N":
+        return target in KNIGHT_TARGETS[start]
+
+    if letter == "P":
+        return target in PAWN_ATTACKS[player][start]
+
+    u = LINES[start][target]
+
+    if u == None:
+        return False
+
+    diagonal = u[0] != 0 and u[1] != 0
+
+    if (letter == "R" and diagonal) or (letter == "B" and not diagonal):
+        return False
+
+    for square in BETWEEN[start][target]:
+
+        if square in occupied:
+            return False
+
+    return True
+
+
+def isAttacked(target, player, pieces, squares, occupied):
+
+    """
+    Checks if any piece of player attacks the target square. Captured
+    pieces have None as their square.
+    """
+
+    for (owner, letter), square in zip(pieces, squares):
+
+        if owner == player and square != None and attacks(letter, owner, square, target, occupied):
+            return True
+
+    return False
+
+
+def isValid(material, stm, squares):
+
+    """
+    Checks if a position can occur: no two pieces on one square, no pawns
+    on the first or last rank and the side that isn't to move not in check.
+    """
+
+    occupied = set(squares)
+
+    if len(occupied) != len(squares):
+        return False
+
+    for (_, letter), square in zip(material.pieces, squares):
+
+        if letter == "P" and (square < 8 or square >= 56):
+            return False
+
+    other = 1 - stm
+
+    return not isAttacked(squares[material.kings[other]], stm, material.pieces, squares, occupied)
+
+
+def generateMoves(material, stm, squares):
+
+    """
+    Generator over the legal moves of the side to move as tuples of the
+    index of the moving piece, its destination, the index of the captured
+    piece (None if there is none) and the promotion letter (None if there
+    is none). Castling and en passant aren't generated.
+    """
+
+    pieces = material.pieces
+    occupant = {square: i for i, square in enumerate(squares)}
+    king = material.kings[stm]
+
+    for i, ((player, letter), start) in enumerate(zip(pieces, squares)):
+
+        if player != stm:
+            continue
+
+        destinations = []
+
+        if letter == "K":
+
+            destinations = KING_TARGETS[start]
+
+        elif letter == "N":
+
+            destinations = KNIGHT_TARGETS[start]
+
+        elif letter == "P":
+
+            d = -8 if player == WHITE else 8
+            forward = start + d
+
+            if forward not in occupant:
+
+                destinations = [forward]
+
+                # pawns on their starting rank can move 2 squares
+                if (player == WHITE and start >= 48) or (player == BLACK and start < 16):
+
+                    if forward + d not in occupant:
+                        destinations.append(forward + d)
+
+            destinations = destinations + [target for target in PAWN_ATTACKS[player][start]
+                                           if target in occupant]
+
+        else:
+
+            for u in SLIDER_DIRECTIONS[letter]:
+
+                for target in RAYS[start][u]:
+
+                    destinations.append(target)
+
+                    if target in occupant:
+                        break
+
+        for target in destinations:
+
+            captured = occupant.get(target)
+
+            if captured != None and (pieces[captured][0] == stm or pieces[captured][1] == "K"):
+                continue
+
+            # the king of the side to move can't be in check afterwards
+            newSquares = list(squares)
+            newSquares[i] = target
+
+            if captured != None:
+                newSquares[captured] = None
+
+            occupied = set(square for square in newSquares if square != None)
+
+            if isAttacked(newSquares[king], 1 - stm, pieces, newSquares, occupied):
+                continue
+
+            if letter == "P" and (target < 8 or target >= 56):
+
+                for promotion in PROMOTIONS:
+                    yield i, target, captured, promotion
+
+            else:
+
+                yield i, target, captured, None
+
+    return
+
+
+def generateUnmoves(material, stm, squares):
+
+    """
+    Generator over the positions the current one can be reached from with
+    a move that doesn't capture or promote, as indices. Every move is
+    generated once, which is what the move counters of the generation rely
+    on.
+    """
+
+    pieces = material.pieces
+    occupied = set(squares)
+    previous = 1 - stm
+    king = material.kings[stm]
+
+    for i, ((player, letter), target) in enumerate(zip(pieces, squares)):
+
+        if player != previous:
+            continue
+
+        starts = []
+
+        if letter == "K":
+
+            starts = [start for start in KING_TARGETS[target] if start not in occupied]
+
+        elif letter == "N":
+
+            starts = [start for start in KNIGHT_TARGETS[target] if start not in occupied]
+
+        elif letter == "P":
+
+            # pawns come from the square behind them, or 2 squares behind
+            # from their starting rank
+            d = 8 if player == WHITE else -8
+            start = target + d
+
+            if start not in occupied and 8 <= start < 56:
+
+                starts.append(start)
+
+                if (player == WHITE and 32 <= target < 40) or (player == BLACK and 24 <= target < 32):
+
+                    if start + d not in occupied:
+                        starts.append(start + d)
+
+        else:
+
+            for u in SLIDER_DIRECTIONS[letter]:
+
+                for start in RAYS[target][u]:
+
+                    if start in occupied:
+                        break
+
+                    starts.append(start)
+
+        for start in starts:
+
+            newSquares = list(squares)
+            newSquares[i] = start
+
+            # the side to move now wasn't to move before, so it can't have
+            # been in check
+            newOccupied = set(newSquares)
+
+            if isAttacked(newSquares[king], previous, pieces, newSquares, newOccupied):
+                continue
+
+            yield encodeIndex(previous, newSquares)
+
+    return
+
+
+class Tablebases():
+
+    """
+    The tables in a directory, memory-mapped when they are first used.
+    """
+
+    def __init__(self, directory):
+
+        self.directory = directory
+        self.tables = {}
+        self.files = []
+
+        # the most pieces any table in the directory has, positions with
+        # more aren't worth looking up
+        names = [name[:-3] for name in os.listdir(directory) if name.endswith(".tb")] \
+                if os.path.isdir(directory) else []
+        self.maxPieces = max((len(name) for name in names), default = 0)
+
+
+    def close(self):
+
+        for table in self.tables.values():
+
+            if table != None:
+                table.close()
+
+        for file in self.files:
+            file.close()
+
+        self.tables = {}
+        self.files = []
+
+        return
+
+
+    def path(self, name):
+
+        return os.path.join(self.directory, name + ".tb")
+
+
+    def table(self, name):
+
+        """
+        Returns the memory-mapped table of a material, None if there is no
+        file for it.
+        """
+
+        if name not in self.tables:
+
+            path = self.path(name)
+
+            if os.path.exists(path):
+
+                file = open(path, "rb")
+                self.files.append(file)
+                self.tables[name] = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+
+            else:
+
+                self.tables[name] = None
+
+        return self.tables[name]
+
+
+    def probePieces(self, pieces, stm):
+
+        """
+        Returns the value of a position given as a list of (player, letter,
+        square) and the side to move. Returns None if there is no table for
+        the pieces.
+        """
+
+        white = "".join(letter for player, letter, _ in pieces if player == WHITE and letter != "K")
+        black = "".join(letter for player, letter, _ in pieces if player == BLACK and letter != "K")
+
+        if isTrivialDraw(white, black):
+            return DRAW
+
+        name, swapped = canonicalName(white, black)
+        table = self.table(name)
+
+        if table == None:
+            return None
+
+        # the table has the other player as white, the board is mirrored
+        if swapped:
+
+            pieces = [(1 - player, letter, square ^ 56) for player, letter, square in pieces]
+            stm = 1 - stm
+
+        material = Material(name)
+        squares = []
+        unused = list(pieces)
+
+        for player, letter in material.pieces:
+
+            for piece in unused:
+
+                if piece[0] == player and piece[1] == letter:
+
+                    squares.append(piece[2])
+                    unused.remove(piece)
+                    break
+
+        return table[encodeIndex(stm, squares)]
+
+
+    def probe(self, gamestate):
+
+        """
+        Looks up a game state. Returns a tuple of the result for the side to
+        move ("win", "draw" or "loss") and the plies until mate, or None if
+        the position isn't covered: no table for its pieces, castling rights,
+        a possible en passant capture or a position that can't occur.
+        """
+
+        if gamestate.castlingRights():
+            return None
+
+        pieces = [(WHITE if player == "white" else BLACK, TYPE_LETTERS[piece.pieceType],
+                   piece.row*8 + piece.col)
+                  for player in gamestate.players for piece in gamestate.activePieces[player]]
+        stm = WHITE if gamestate.turnPlayer == "white" else BLACK
+
+        # the en passant square only matters if a pawn can capture on it
+        if gamestate.board.enPassantCoordinates:
+
+            row, col = gamestate.board.enPassantCoordinates
+
+            for player, letter, square in pieces:
+
+                if player == stm and letter == "P" and row*8 + col in PAWN_ATTACKS[stm][square]:
+                    return None
+
+        value = self.probePieces(pieces, stm)
+
+        if value == None or value == INVALID:
+            return None
+
+        return decode(value)
+
+
+# every worker process keeps the tables it opened
+workerTablebases = {}
+
+
+def getTablebases(directory):
+
+    if directory not in workerTablebases:
+        workerTablebases[directory] = Tablebases(directory)
+
+    return workerTablebases[directory]
+
+
+def scanTask(task):
+
+    """
+    Worker function, the first pass of the generation over a range of
+    indices. Returns the start of the range and four byte strings with one
+    byte per position: the initial value (INVALID, checkmate or 0), the
+    number of legal moves that stay in the table, what the moves leaving
+    the table (captures and promotions) lead to and the plies of that.
+    Leaving moves are 0 when they all lose, with the plies of the longest
+    loss, 1 when one of them draws and 2 when one of them wins, with the
+    plies of the shortest win.
+    """
+
+    name, directory, start, end = task
+
+    material = Material(name)
+    tablebases = getTablebases(directory)
+
+    values = bytearray(end - start)
+    counters = bytearray(end - start)
+    exitStates = bytearray(end - start)
+    exitPlies = bytearray(end - start)
+
+    for index in range(start, end):
+
+        stm, squares = decodeIndex(index, material.count)
+        offset = index - start
+
+        if not isValid(material, stm, squares):
+
+            values[offset] = INVALID
+            continue
+
+        moves = 0
+        counter = 0
+        state = 0
+        winPlies = MAX_PLIES + 1
+        lossPlies = 0
+
+        for i, target, captured, promotion in generateMoves(material, stm, squares):
+
+            moves += 1
+
+            if captured == None and promotion == None:
+
+                counter += 1
+                continue
+
+            # the move leaves the table, the smaller table has the answer
+            pieces = []
+
+            for j, ((player, letter), square) in enumerate(zip(material.pieces, squares)):
+
+                if j == captured:
+                    continue
+
+                if j == i:
+                    pieces.append((player, promotion if promotion != None else letter, target))
+                else:
+                    pieces.append((player, letter, square))
+
+            value = tablebases.probePieces(pieces, 1 - stm)
+
+            if value == None:
+                raise RuntimeError(f"Generating {name} needs the tables it can go over to.")
+
+            result, plies = decode(value)
+
+            if result == "loss":
+
+                state = 2
+                winPlies = min(winPlies, plies + 1)
+
+            elif result == "draw":
+
+                state = max(state, 1)
+
+            else:
+
+                lossPlies = max(lossPlies, plies + 1)
+
+        if moves == 0:
+
+            # checkmate is resolved right away, stalemate is a draw with
+            # nothing that could change it
+            if isAttacked(squares[material.kings[stm]], 1 - stm, material.pieces, squares, set(squares)):
+                values[offset] = encodeLoss(0)
+            else:
+                state = 1
+
+        counters[offset] = counter
+        exitStates[offset] = state
+        exitPlies[offset] = winPlies if state == 2 else lossPlies if state == 0 else 0
+
+    return start, bytes(values), bytes(counters), bytes(exitStates), bytes(exitPlies)
+
+
+def unmoveTask(task):
+
+    """
+    Worker function, returns the indices of all positions one move before
+    each of the given positions, with one entry per move.
+    """
+
+    name, indices = task
+
+    material = Material(name)
+    predecessors = []
+
+    for index in indices:
+
+        stm, squares = decodeIndex(index, material.count)
+        predecessors.extend(generateUnmoves(material, stm, squares))
+
+    return predecessors
+
+
+def runTasks(function, tasks, pool):
+
+    """
+    Generator over the results of the tasks, in a process pool if there is
+    one. Results come in the order they finish.
+    """
+
+    if pool == None:
+        return map(function, tasks)
+
+    return pool.imap_unordered(function, tasks)
+
+
+def chunks(items, size):
+
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def dependencies(material):
+
+    """
+    Names of the tables the moves out of a material's table go to:
+    captures, promotions and both at once. Trivial draws need no table.
+    """
+
+    names = set()
+
+    def add(white, black):
+
+        if not isTrivialDraw(white, black):
+            names.add(canonicalName(white, black)[0])
+
+    sides = [material.white, material.black]
+
+    for player in (WHITE, BLACK):
+
+        own = sides[player]
+        other = sides[1 - player]
+
+        for i, letter in enumerate(own):
+
+            rest = own[:i] + own[i+1:]
+
+            # the piece gets captured
+            if player == WHITE:
+                add(rest, other)
+            else:
+                add(other, rest)
+
+            if letter != "P":
+                continue
+
+            for promotion in PROMOTIONS:
+
+                # promotion, with or without capturing a piece of the
+                # other player
+                options = [other] + [other[:j] + other[j+1:] for j in range(len(other))]
+
+                for remaining in options:
+
+                    if player == WHITE:
+                        add(rest + promotion, remaining)
+                    else:
+                        add(remaining, rest + promotion)
+
+    names.discard(material.name)
+
+    return sorted(names)
+
+
+def generate(name, directory, processes = None, progress = None):
+
+    """
+    Generates the table of a material and writes it to the directory.
+    Tables it depends on are generated first if they don't exist yet.
+    progress is called with the name, the phase ("scan" or "ply"), and the
+    fraction of the scan done or the current ply and the number of
+    positions resolved in it. Returns a dictionary with the number of
+    wins, draws and losses and the longest mate in plies.
+    """
+
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+
+    material = Material(name)
+    name = material.name
+
+    if name != canonicalName(material.white, material.black)[0]:
+        raise ValueError(f"Generate {canonicalName(material.white, material.black)[0]} "
+                         f"instead of {name}, the stronger side is white.")
+
+    os.makedirs(directory, exist_ok = True)
+
+    for dependency in dependencies(material):
+
+        if not os.path.exists(os.path.join(directory, dependency + ".tb")):
+            generate(dependency, directory, processes, progress)
+
+    # the tables it depends on may have been written since they were last
+    # looked for
+    for tablebases in workerTablebases.values():
+        tablebases.close()
+
+    workerTablebases.clear()
+
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+
+    try:
+
+        # first pass: checkmates, move counters and moves leaving the table
+        values = bytearray(material.size)
+        counters = bytearray(material.size)
+        exitStates = bytearray(material.size)
+        exitPlies = bytearray(material.size)
+
+        chunkSize = 64 ** (material.count - 1)
+        tasks = [(name, directory, start, min(start + chunkSize, material.size))
+                 for start in range(0, material.size, chunkSize)]
+        done = 0
+
+        for start, *parts in runTasks(scanTask, tasks, pool):
+
+            end = start + len(parts[0])
+
+            for array, part in zip((values, counters, exitStates, exitPlies), parts):
+                array[start:end] = part
+
+            done += 1
+
+            if progress != None:
+                progress(name, "scan", done / len(tasks))
+
+        # positions are resolved ply by ply, a position lost in n plies makes
+        # every position before it won in n + 1 plies, a position is lost in
+        # n + 1 plies once every move from it leads to a position won in at
+        # most n plies. Moves out of the table come in at their own ply
+        wins = {}
+        losses = {}
+
+        for index in range(material.size):
+
+            if values[index] == INVALID:
+                continue
+
+            if values[index] == encodeLoss(0):
+
+                values[index] = DRAW
+                losses.setdefault(0, []).append(index)
+
+            elif exitStates[index] == 2:
+
+                wins.setdefault(exitPlies[index], []).append(index)
+
+            elif exitStates[index] == 0 and counters[index] == 0:
+
+                losses.setdefault(exitPlies[index], []).append(index)
+
+        longest = 0
+        ply = 0
+
+        while wins or losses:
+
+            if ply > MAX_PLIES:
+                raise RuntimeError(f"Mates in {name} are too long to store.")
+
+            frontier = []
+
+            for index in wins.pop(ply, []):
+
+                if values[index] == DRAW:
+
+                    values[index] = encodeWin(ply)
+                    frontier.append(index)
+
+            for index in losses.pop(ply, []):
+
+                if values[index] == DRAW:
+
+                    values[index] = encodeLoss(ply)
+                    frontier.append(index)
+
+            if frontier:
+                longest = ply
+
+            if progress != None:
+                progress(name, "ply", (ply, len(frontier)))
+
+            size = max(1, min(10000, len(frontier) // (4 * processes) + 1))
+            tasks = [(name, indices) for indices in chunks(frontier, size)]
+
+            for predecessors in runTasks(unmoveTask, tasks, pool):
+
+                # wins have an odd number of plies, losses an even one
+                if ply % 2 == 0:
+
+                    wins.setdefault(ply + 1, []).extend(predecessors)
+
+                else:
+
+                    for index in predecessors:
+
+                        if values[index] != DRAW or exitStates[index] != 0:
+                            continue
+
+                        counters[index] -= 1
+
+                        if counters[index] == 0:
+                            losses.setdefault(max(ply + 1, exitPlies[index]), []).append(index)
+
+            ply += 1
+
+    finally:
+
+        if pool != None:
+
+            pool.close()
+            pool.join()
+
+    path = os.path.join(directory, name + ".tb")
+
+    with open(path + ".tmp", "wb") as file:
+        file.write(values)
+
+    os.replace(path + ".tmp", path)
+
+    statistics = {"wins": 0, "draws": 0, "losses": 0, "longest": longest}
+
+    for value in range(256):
+
+        count = values.count(value)
+
+        if value == INVALID or count == 0:
+            continue
+
+        statistics[{"win": "wins", "draw": "draws", "loss": "losses"}[decode(value)[0]]] += count
+
+    return statistics
+
+
+def main():
+
+    """
+    Command line interface for generating tablebases.
+    """
+
+    parser = argparse.ArgumentParser(description = "Generate endgame tablebases.")
+    parser.add_argument("materials", nargs = "+",
+                        help = "tables to generate, e.g. KQK KRK KPK KBNK")
+    parser.add_argument("-o", "--directory", default = "tablebases",
+                        help = "directory the tables are written to")
+    parser.add_argument("-j", "--processes", type = int, default = None,
+                        help = "number of processes, defaults to the number of CPUs")
+    args = parser.parse_args()
+
+    def progress(name, phase, value):
+
+        if phase == "scan":
+            print(f"\r{name}  scan {100 * value:5.1f}%", end = "", file = sys.stderr, flush = True)
+        else:
+            print(f"\r{name}  ply {value[0]:3}  resolved {value[1]:9}", end = "",
+                  file = sys.stderr, flush = True)
+
+    for name in args.materials:
+
+        start = time.perf_counter()
+        statistics = generate(name, args.directory, args.processes, progress)
+
+        print(file = sys.stderr)
+        print(f"{Material(name).name}  wins {statistics['wins']}  draws {statistics['draws']}  "
+              f"losses {statistics['losses']}  longest mate {statistics['longest']} plies  "
+              f"time {time.perf_counter() - start:.1f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+
+    raise SystemExit(main())
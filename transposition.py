@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import array
+
+
+# bound types of a stored score
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# bytes used by one entry, a 64 bit key and 64 bits of packed data
+ENTRY_SIZE = 16
+
+
+class TranspositionTable():
+
+    """
+    Fixed size hash table for storing search results by Zobrist key. The
+    entries are kept in two preallocated arrays of 64 bit integers, one for
+    the keys and one for the packed data, so the memory used is set by the
+    budget given in MB and never grows.
+
+    Each bucket holds two entries. The first one is depth-preferred, it is
+    only replaced by results from a search at least as deep. The second one
+    is always replaced and catches everything the first one rejects.
+
+    The packed data contains, from the lowest bit upwards, the best move
+    (16 bits), the depth (8 bits), the bound type (2 bits), a flag marking
+    the entry as used (1 bit) and the score as a signed 37 bit integer.
+    """
+
+    def __init__(self, sizeMB = 16):
+
+        self.bucketCount = max(1, int(sizeMB * 1024 * 1024) // (2 * ENTRY_SIZE))
+
+        # two entries per bucket, 8 bytes each for the key and the data
+        self.keys = array.array("Q", bytes(2 * 8 * self.bucketCount))
+        self.data = array.array("Q", bytes(2 * 8 * self.bucketCount))
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+
+    def __len__(self):
+
+        """
+        Number of entries the table can hold.
+        """
+
+        return 2 * self.bucketCount
+
+
+    def clear(self):
+
+        """
+        Removes all entries and resets the statistics.
+        """
+
+        self.keys = array.array("Q", bytes(len(self.keys) * 8))
+        self.data = array.array("Q", bytes(len(self.data) * 8))
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+        return
+
+
+    def probe(self, key):
+
+        """
+        Looks up a position by its key. Returns a tuple of depth, score,
+        bound type and best move, or None if the position isn't stored.
+        """
+
+        index = 2 * (key % self.bucketCount)
+
+        for slot in (index, index + 1):
+
+            data = self.data[slot]
+
+            if data >> 26 & 1 and self.keys[slot] == key:
+
+                self.hits += 1
+
+                score = data >> 27
+                if score >= 1 << 36:
+                    score -= 1 << 37
+
+                return (data >> 16 & 0xFF, score, data >> 24 & 0b11, data & 0xFFFF)
+
+        self.misses += 1
+
+        return None
+
+
+    def store(self, key, depth, score, bound = EXACT, move = 0):
+
+        """
+        Stores a search result. The depth-preferred entry of the bucket is
+        replaced if it's empty, holds the same position or was searched at
+        most as deep, otherwise the result goes into the always-replace
+        entry. The move is stored as a 16 bit integer.
+        """
+
+        index = 2 * (key % self.bucketCount)
+
+        storedData = self.data[index]
+
+        if storedData >> 26 & 1 and self.keys[index] != key and \
+           storedData >> 16 & 0xFF > depth:
+            index += 1
+
+        # keep the best move of the position if none is given
+        if not move and self.keys[index] == key:
+            move = self.data[index] & 0xFFFF
+
+        if self.data[index] >> 26 & 1 and self.keys[index] != key:
+            self.overwrites += 1
+
+        self.keys[index] = key
+        self.data[index] = ((score & ((1 << 37) - 1)) << 27) | (1 << 26) | \
+                           ((bound & 0b11) << 24) | ((depth & 0xFF) << 16) | \
+                           (move & 0xFFFF)
+        self.stores += 1
+
+        return
+
+
+    def usage(self):
+
+        """
+        Fraction of the entries that are in use.
+        """
+
+        used = sum(1 for data in self.data if data >> 26 & 1)
+
+        return used / len(self.data)
+
+
+    def statistics(self):
+
+        """
+        Returns a dictionary with the size of the table and the number of
+        hits, misses, stores and overwrites since it was created or cleared.
+        """
+
+        probes = self.hits + self.misses
+
+        return {"entries": len(self),
+                "sizeMB": len(self) * ENTRY_SIZE / (1024 * 1024),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / probes if probes else 0.0,
+                "stores": self.stores,
+                "overwrites": self.overwrites}